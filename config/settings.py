@@ -1,10 +1,10 @@
 """Static configuration settings for the journal application"""
 
-from os import path
+from os import path, environ
 
 # Go up one level from config/
 SCRIPT_DIR = path.dirname(path.dirname(path.abspath(__file__)))
-REFERENCE_DIR = path.expanduser("personal/")
+REFERENCE_DIR = path.expanduser(environ.get("JOURNAL_REFERENCE_DIR", "personal/"))
 
 STOICS_FILE = "stoics.csv"
 STOICS_PROGRESS_FILE = "stoic_progress.json"
@@ -12,15 +12,19 @@ TAROT_FILE = "tarot.csv"
 QUESTIONS_DAILY_FILE = "questions-daily.txt"
 QUESTIONS_WEEKLY_FILE = "questions-weekly.txt"
 QUESTIONS_MONTHLY_FILE = "questions-monthly.txt"
+PRERENDER_FILE = "prerendered.json"
+PROVIDER_CACHE_FILE = "content_cache.json"
+IMPORT_CHECKPOINT_FILE = "import-checkpoint.json"
+SNAPSHOT_DIR = "history"
+TEMPLATE_FILE = "template.txt"
+METRICS_STATE_FILE = "metrics.json"
+NETWORK_CACHE_FILE = "network_cache.json"
+EPHEMERIS_FILE = "ephemeris-{year}-{latitude}_{longitude}.bin"
 
 
 # Full paths
-TAROT_CSV = path.join(SCRIPT_DIR, REFERENCE_DIR + TAROT_FILE)
-STOIC_CSV = path.join(SCRIPT_DIR, REFERENCE_DIR + STOICS_FILE)
-STOIC_PROGRESS = path.join(SCRIPT_DIR, REFERENCE_DIR + STOICS_PROGRESS_FILE)
-QUESTIONS_DAILY_TXT = path.join(SCRIPT_DIR, REFERENCE_DIR + QUESTIONS_DAILY_FILE)
-QUESTIONS_WEEKLY_TXT = path.join(SCRIPT_DIR, REFERENCE_DIR + QUESTIONS_WEEKLY_FILE)
-QUESTIONS_MONTHLY_TXT = path.join(SCRIPT_DIR, REFERENCE_DIR + QUESTIONS_MONTHLY_FILE)
+REFERENCE_PATH = path.join(SCRIPT_DIR, REFERENCE_DIR)
+ZIP_GAZETTEER = path.join(SCRIPT_DIR, "data", "zip_gazetteer.bin")
 
 # Application settings
 GLOBAL_WORDCOUNT_GOAL = 750
@@ -28,11 +32,62 @@ MORNING_START_HOUR = 4
 AFTERNOON_START_HOUR = 12
 EVENING_START_HOUR = 17
 STOIC_CATCHUP_RATE = 2
+# Parsed reference files kept per user by the template service
+CONTENT_CACHE_ENTRIES = 16
+# Pre-render tomorrow's morning template after an evening update
+PRERENDER_AFTER_EVENING = False
+# Imported entries written between directory syncs and checkpoints
+IMPORT_SYNC_BATCH = 64
+# Content providers expected to take this long render in the background
+PROVIDER_BACKGROUND_COST_MS = 50
 
 # Tarot settings
 TAROT_SKIP_COLUMNS = {"Seq", "Group", "Up", "Across", "Down"}
 TAROT_COLUMN_MAX_LEN = 30
 
+# Metrics settings
+# node-exporter textfile written after each run (empty to disable)
+METRICS_TEXTFILE = environ.get(
+    "JOURNAL_METRICS_TEXTFILE", path.join(REFERENCE_PATH, "journal.prom")
+)
+
+# Locking settings
+LOCK_DIR = path.expanduser(environ.get("JOURNAL_LOCK_DIR", "~/.cache/journal-py/locks"))
+LOCK_TIMEOUT_SECONDS = 5
+
+# Staging settings
+# Fast local directory entries are edited in, flushed to the synced folder (empty to disable)
+LOCAL_STAGING_DIR = path.expanduser(
+    environ.get("JOURNAL_STAGING_DIR", "~/.cache/journal-py/staging")
+)
+STAGING_FLUSH_INTERVAL_SECONDS = 2
+# Background flusher exits after this long without changes
+STAGING_IDLE_EXIT_SECONDS = 2 * 60 * 60
+
+# Snapshot settings
+# Versions kept per entry, and days after which all but the newest go
+SNAPSHOT_KEEP_VERSIONS = 100
+SNAPSHOT_KEEP_DAYS = 365
+SNAPSHOT_PRUNE_INTERVAL_SECONDS = 24 * 60 * 60
+
+# Zodiac settings
+EPHEMERIS_STEP_HOURS = 6
+
+# Location settings
+# HTTP fallback for ZIP codes missing from the offline gazetteer (None to disable)
+ZIP_LOOKUP_URL = environ.get(
+    "JOURNAL_ZIP_LOOKUP_URL", "https://api.zippopotam.us/us/{zipcode}"
+)
+# Most time a location lookup may add to startup (asking for a new network's ZIP excepted)
+LOCATION_BUDGET_MS = 250
+# Cached coordinates are looked up again by ZIP code after this long
+NETWORK_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# How long the current network's addresses are reused before checking again
+NETWORK_FINGERPRINT_TTL_SECONDS = 60
+HTTP_TIMEOUT_SECONDS = 5
+HTTP_RETRIES = 2
+HTTP_BACKOFF_SECONDS = 0.5
+
 # Platform-specific settings
 
 
@@ -1,9 +1,11 @@
 """Runtime state management for the journal application"""
 
 from os import path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from contextvars import ContextVar
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from utils.cache import LRUCache
 
 
 @dataclass
@@ -17,20 +19,37 @@ class JournalState:
     is_afternoon: bool
     is_evening: bool
     timestamp_hhmm: str
+    base_date: datetime
     title_now: str
     title_now_8_weeks_ago: str
     path: str
     entry_file_path: str
     editor_subprocess: List[str]
     editor_8_weeks_ago_subprocess: List[str]
+    reference_dir: str
+    content_cache: Optional[LRUCache] = None
+    synced_path: Optional[str] = None
+
+    def reference_file(self, file_name: str) -> str:
+        """Full path of a file in the reference directory"""
+        return path.join(self.reference_dir, file_name)
 
     @classmethod
-    def initialize(cls, args: Dict[str, Any]) -> "JournalState":
+    def initialize(
+        cls,
+        args: Dict[str, Any],
+        platform_settings: Optional[Dict[str, Any]] = None,
+        reference_dir: Optional[str] = None,
+        content_cache: Optional[LRUCache] = None,
+        staging_dir: Optional[str] = None,
+    ) -> "JournalState":
         """Create initial state based on current time and arguments"""
         from . import settings
         from utils.dates import generate_title
+        from utils import clock
 
-        current_hour = int(datetime.now().strftime("%H"))
+        now = clock.now()
+        current_hour = int(now.strftime("%H"))
         is_late_night = current_hour < settings.MORNING_START_HOUR
         is_morning = (
             settings.MORNING_START_HOUR < current_hour < settings.AFTERNOON_START_HOUR
@@ -41,24 +60,27 @@ class JournalState:
         is_evening = current_hour > settings.EVENING_START_HOUR
 
         # Get platform-specific settings
-        platform_settings = settings.get_platform_settings()
+        if platform_settings is None:
+            platform_settings = settings.get_platform_settings()
 
         # Override path if in test mode
         journal_path = (
             path.expanduser("~") if args["test"] else platform_settings["path"]
         )
+        # Edit in the local staging directory, flushing to the synced folder later
+        synced_path = None
+        if staging_dir and not args["test"]:
+            synced_path, journal_path = journal_path, staging_dir
 
         # Calculate timestamp
         timestamp_hhmm = (
             str(2400 + current_hour)
             if is_late_night
-            else datetime.now().strftime("%H%M")
+            else now.strftime("%H%M")
         )
 
         # Calculate titles
-        base_date = (
-            datetime.now() - timedelta(days=1) if is_late_night else datetime.now()
-        )
+        base_date = now - timedelta(days=1) if is_late_night else now
         weeks_ago_date = (
             base_date - timedelta(weeks=8, days=1)
             if is_late_night
@@ -83,27 +105,50 @@ class JournalState:
             is_afternoon=is_afternoon,
             is_evening=is_evening,
             timestamp_hhmm=timestamp_hhmm,
+            base_date=base_date,
             title_now=title_now,
             title_now_8_weeks_ago=title_now_8_weeks_ago,
             path=journal_path,
             entry_file_path=entry_file_path,
             editor_subprocess=editor_subprocess,
             editor_8_weeks_ago_subprocess=editor_8_weeks_ago_subprocess,
+            reference_dir=reference_dir or settings.REFERENCE_PATH,
+            content_cache=content_cache,
+            synced_path=synced_path,
         )
 
 
-# Global state instance
-journal_state = None
+# State of the current run (or service request)
+journal_state: ContextVar[Optional[JournalState]] = ContextVar(
+    "journal_state", default=None
+)
+
 
+def initialize_state(
+    args: Dict[str, Any],
+    now: Optional[datetime] = None,
+    platform_settings: Optional[Dict[str, Any]] = None,
+    reference_dir: Optional[str] = None,
+    content_cache: Optional[LRUCache] = None,
+    staging_dir: Optional[str] = None,
+) -> None:
+    """Initialize the state for the current context
 
-def initialize_state(args: Dict[str, Any]) -> None:
-    """Initialize the global state"""
-    global journal_state  # pylint: disable=global-statement
-    journal_state = JournalState.initialize(args)
+    The clock is snapshotted, or pinned to now if given.
+    """
+    from utils import clock
+
+    clock.set_now(now)
+    journal_state.set(
+        JournalState.initialize(
+            args, platform_settings, reference_dir, content_cache, staging_dir
+        )
+    )
 
 
 def get_state() -> JournalState:
     """Get the current state"""
-    if journal_state is None:
+    state = journal_state.get()
+    if state is None:
         raise RuntimeError("Journal state not initialized")
-    return journal_state
+    return state
@@ -0,0 +1,298 @@
+"""Precomputed yearly ephemeris tables for zodiac information
+
+Computing positions with ephem on every run is slow and needs a location, so a
+table is generated once per year and location: ecliptic longitude of each body
+and the moon phase every STEP_HOURS, plus sunrise and sunset for each day.
+Lookups interpolate between table rows.
+
+File layout (little endian):
+
+    header     magic b"EPHM", version, year, step hours, steps, days (uint32),
+               latitude, longitude (float64)
+    positions  float32[steps] per body in BODIES order (degrees)
+    moon phase float32[steps] (percent illuminated)
+    sunrise    float64[days] (UTC timestamps, NaN when the sun does not rise)
+    sunset     float64[days] (UTC timestamps, NaN when the sun does not set)
+"""
+
+import sys
+import math
+import struct
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, TYPE_CHECKING
+from config.settings import EPHEMERIS_FILE, EPHEMERIS_STEP_HOURS
+from config.state import get_state
+from utils import clock
+from utils.locking import atomic_write
+
+if TYPE_CHECKING:
+    from localtypes.ephem_types import EphemBody, EphemObserver
+
+HEADER = struct.Struct("<4sIIIIIdd")
+MAGIC = b"EPHM"
+VERSION = 1
+
+BODIES = ("Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn")
+SIGNS = (
+    "Aries",
+    "Taurus",
+    "Gemini",
+    "Cancer",
+    "Leo",
+    "Virgo",
+    "Libra",
+    "Scorpio",
+    "Sagittarius",
+    "Capricorn",
+    "Aquarius",
+    "Pisces",
+)
+
+
+def sign_of(longitude: float) -> str:
+    """Zodiac sign of an ecliptic longitude in degrees"""
+    return SIGNS[int(longitude % 360 // 30)]
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # Naive datetimes (such as the run clock) are local time
+    return moment.astimezone(timezone.utc)
+
+
+def _local_date(moment: datetime) -> date:
+    # The observer's calendar day: naive datetimes are already local, aware
+    # ones are read in their own timezone
+    return moment.date()
+
+
+@dataclass
+class EphemerisTable:
+    """Positions, moon phase and sun times for one year at one location"""
+
+    year: int
+    step_hours: int
+    latitude: float
+    longitude: float
+    positions: Dict[str, array]
+    moon_phase: array
+    sunrise: array
+    sunset: array
+
+    @property
+    def start(self) -> datetime:
+        """Moment of the first table row"""
+        return datetime(self.year, 1, 1, tzinfo=timezone.utc)
+
+    def _row(self, moment: datetime):
+        offset = (_as_utc(moment) - self.start).total_seconds() / 3600
+        steps = len(self.moon_phase)
+        if not 0 <= offset <= (steps - 1) * self.step_hours:
+            raise ValueError(f"{moment} is not covered by the {self.year} table")
+        index = min(int(offset // self.step_hours), steps - 2)
+        return index, offset / self.step_hours - index
+
+    def position(self, body: str, moment: datetime) -> float:
+        """Ecliptic longitude of a body in degrees, interpolated between rows"""
+        index, fraction = self._row(moment)
+        start, end = self.positions[body][index], self.positions[body][index + 1]
+        # Take the short way around when crossing 0 degrees Aries
+        delta = (end - start + 180) % 360 - 180
+        return (start + delta * fraction) % 360
+
+    def phase(self, moment: datetime) -> float:
+        """Percent of the moon illuminated, interpolated between rows"""
+        index, fraction = self._row(moment)
+        start, end = self.moon_phase[index], self.moon_phase[index + 1]
+        return start + (end - start) * fraction
+
+    def sun_times(self, moment: datetime) -> Dict[str, Optional[datetime]]:
+        """Sunrise and sunset (UTC) of the observer's local day containing moment"""
+        day = (_local_date(moment) - date(self.year, 1, 1)).days
+        if not 0 <= day < len(self.sunrise):
+            raise ValueError(f"{moment} is not covered by the {self.year} table")
+        times = {}
+        for name, values in (("sunrise", self.sunrise), ("sunset", self.sunset)):
+            value = values[day]
+            times[name] = (
+                None
+                if math.isnan(value)
+                else datetime.fromtimestamp(value, tz=timezone.utc)
+            )
+        return times
+
+    def save(self, file_path: str) -> None:
+        """Write the table to file_path, replacing it atomically"""
+        arrays = [self.positions[body] for body in BODIES]
+        arrays += [self.moon_phase, self.sunrise, self.sunset]
+        chunks = [
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.year,
+                self.step_hours,
+                len(self.moon_phase),
+                len(self.sunrise),
+                self.latitude,
+                self.longitude,
+            )
+        ]
+        for values in arrays:
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            chunks.append(values.tobytes())
+        atomic_write(file_path, b"".join(chunks))
+
+    @classmethod
+    def load(cls, file_path: str) -> "EphemerisTable":
+        """Read a table written by save, raising ValueError if it is damaged"""
+        with open(file_path, "rb") as file:
+            try:
+                header = HEADER.unpack(file.read(HEADER.size))
+            except struct.error as e:
+                raise ValueError(f"Truncated ephemeris table: {file_path}") from e
+            magic, version, year, step_hours, steps, days, lat, lon = header
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not an ephemeris table: {file_path}")
+
+            def read(typecode: str, count: int) -> array:
+                values = array(typecode)
+                try:
+                    values.fromfile(file, count)
+                except EOFError as e:
+                    raise ValueError(f"Truncated ephemeris table: {file_path}") from e
+                if sys.byteorder != "little":
+                    values.byteswap()
+                return values
+
+            positions = {body: read("f", steps) for body in BODIES}
+            return cls(
+                year=year,
+                step_hours=step_hours,
+                latitude=lat,
+                longitude=lon,
+                positions=positions,
+                moon_phase=read("f", steps),
+                sunrise=read("d", days),
+                sunset=read("d", days),
+            )
+
+
+def compute_position(body: "EphemBody", moment: datetime) -> float:
+    """Ecliptic longitude (of date) of a body in degrees, computed with ephem"""
+    import ephem  # pylint: disable=import-outside-toplevel
+
+    date = ephem.Date(_as_utc(moment).replace(tzinfo=None))
+    body.compute(date)
+    return math.degrees(ephem.Ecliptic(body, epoch=date).lon)
+
+
+def compute_sun_time(observer: "EphemObserver", day_start: datetime, rising: bool):
+    """UTC timestamp of the first sunrise or sunset after day_start, or NaN"""
+    import ephem  # pylint: disable=import-outside-toplevel
+
+    observer.date = ephem.Date(day_start.replace(tzinfo=None))
+    try:
+        if rising:
+            event = observer.next_rising(ephem.Sun())
+        else:
+            event = observer.next_setting(ephem.Sun())
+    except (ephem.AlwaysUpError, ephem.NeverUpError):
+        return math.nan
+    return ephem.Date(event).datetime().replace(tzinfo=timezone.utc).timestamp()
+
+
+def generate_table(
+    year: int,
+    latitude: float,
+    longitude: float,
+    step_hours: int = EPHEMERIS_STEP_HOURS,
+) -> EphemerisTable:
+    """Compute a table for a year and location with ephem"""
+    import ephem  # pylint: disable=import-outside-toplevel
+
+    start = datetime(year, 1, 1, tzinfo=timezone.utc)
+    days = (datetime(year + 1, 1, 1, tzinfo=timezone.utc) - start).days
+    steps = days * 24 // step_hours + 1
+    bodies = {body: getattr(ephem, body)() for body in BODIES}
+
+    positions = {body: array("f") for body in BODIES}
+    moon_phase = array("f")
+    for step in range(steps):
+        moment = start + timedelta(hours=step * step_hours)
+        for body in BODIES:
+            positions[body].append(compute_position(bodies[body], moment))
+        moon_phase.append(bodies["Moon"].phase)
+
+    observer = ephem.Observer()
+    observer.lat = str(latitude)
+    observer.lon = str(longitude)
+    sunrise, sunset = array("d"), array("d")
+    for day in range(days):
+        # Local midnight, approximated from the longitude
+        day_start = start + timedelta(days=day, hours=-longitude / 15)
+        sunrise.append(compute_sun_time(observer, day_start, rising=True))
+        sunset.append(compute_sun_time(observer, day_start, rising=False))
+
+    return EphemerisTable(
+        year=year,
+        step_hours=step_hours,
+        latitude=latitude,
+        longitude=longitude,
+        positions=positions,
+        moon_phase=moon_phase,
+        sunrise=sunrise,
+        sunset=sunset,
+    )
+
+
+def get_table(year: int, latitude: float, longitude: float) -> EphemerisTable:
+    """Load the table for a year and location, generating it the first time"""
+    # Tables are shared by locations within about 10km
+    latitude, longitude = round(latitude, 1), round(longitude, 1)
+    file_path = get_state().reference_file(
+        EPHEMERIS_FILE.format(year=year, latitude=latitude, longitude=longitude)
+    )
+    try:
+        return EphemerisTable.load(file_path)
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        # Damaged (such as by an interrupted run) or outdated: generate it again
+        print(f"Warning: {e}")
+    table = generate_table(year, latitude, longitude)
+    table.save(file_path)
+    return table
+
+
+def get_zodiac_line(moment: Optional[datetime] = None) -> str:
+    """Zodiac information for the entry, or an empty string if unavailable"""
+    # pylint: disable=import-outside-toplevel
+    from utils.network import get_location
+
+    moment = moment or clock.now()
+    try:
+        latitude, longitude = get_location()
+        # Sun times go by the local day, positions by UTC, so around New Year
+        # they can come from different tables
+        table = get_table(_local_date(moment).year, latitude, longitude)
+        utc_year = _as_utc(moment).year
+        positions = (
+            table
+            if utc_year == table.year
+            else get_table(utc_year, latitude, longitude)
+        )
+    except (RuntimeError, ImportError, OSError, ValueError) as e:
+        print(f"Warning: zodiac information unavailable: {e}")
+        return ""
+
+    signs = ", ".join(
+        f"{body} in {sign_of(positions.position(body, moment))}" for body in BODIES
+    )
+    result = f"Zodiac: {signs}, Moon {positions.phase(moment):.0f}% illuminated"
+    for name, time in table.sun_times(moment).items():
+        if time:
+            result += f", {name.capitalize()} {time.astimezone():%H:%M}"
+    return result + "\n"
@@ -0,0 +1,274 @@
+"""Registry of the content blocks that go into entries
+
+Each provider declares the reference files it reads, when its cached output
+goes stale, what it is expected to cost and the marker that shows it is
+already in an entry. run_providers only renders the providers that were asked
+for, reusing outputs cached by earlier runs (so the evening run can reuse what
+the morning run rendered), and starts the costly ones first in the background.
+
+Invalidation rules:
+    "date"   output is reused for the rest of the day
+    "mtime"  output is reused for the day until one of its inputs changes
+    "none"   output is rendered every time
+"""
+
+import os
+import re
+import json
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from config.settings import (
+    TAROT_FILE,
+    STOICS_FILE,
+    STOICS_PROGRESS_FILE,
+    QUESTIONS_DAILY_FILE,
+    QUESTIONS_WEEKLY_FILE,
+    QUESTIONS_MONTHLY_FILE,
+    PROVIDER_CACHE_FILE,
+    PROVIDER_BACKGROUND_COST_MS,
+    LOCATION_BUDGET_MS,
+)
+from config.state import get_state
+from content.tarot import pull_tarot_card
+from content.ephemeris import get_zodiac_line
+from content.questions import get_questions_not_in_entry, get_questions_for_date
+from content.stoic import (
+    stoic_json_get_progress,
+    stoic_json_set_progress,
+    render_stoic_entries,
+    progress_to_json,
+    progress_from_json,
+)
+from utils.file_ops import read_cached
+from utils.locking import locked, atomic_write
+from utils.metrics import increment, observe
+
+INVALIDATION_RULES = ("date", "mtime", "none")
+
+# Rendered text, and state to commit once it is used (the stoic progress)
+Rendered = Tuple[str, Optional[dict]]
+
+
+@dataclass(frozen=True)
+class ContentProvider:
+    """A content block and how its output may be cached"""
+
+    name: str  # template placeholder
+    arg: str  # command line argument that asks for it
+    render: Callable[[Optional[datetime]], Rendered]
+    inputs: Tuple[str, ...] = ()
+    invalidation: str = "none"
+    cost_ms: float = 1.0
+    exclusion_re: str = ""
+    # Added after the block in a new entry's template
+    template_suffix: str = ""
+    commit: Optional[Callable[[dict], None]] = None
+    dump_pending: Callable[[dict], dict] = dict
+    load_pending: Callable[[dict], dict] = dict
+
+    def __post_init__(self):
+        if self.invalidation not in INVALIDATION_RULES:
+            raise ValueError(f"Unknown invalidation rule: {self.invalidation}")
+
+    def cache_key(self, date: Optional[datetime]) -> Optional[str]:
+        """Key of this provider's output for a date, or None if it is not cached
+
+        A date of None renders for today's entry rather than a new entry's
+        template, which can differ (the questions), so it is part of the key.
+        """
+        if self.invalidation == "none":
+            return None
+        state = get_state()
+        day = (date or state.base_date).strftime("%Y-%m-%d")
+        key = [self.name, day, date is None]
+        if self.invalidation == "mtime":
+            for name in self.inputs:
+                try:
+                    key.append(os.stat(state.reference_file(name)).st_mtime_ns)
+                except FileNotFoundError:
+                    key.append(None)
+        return json.dumps(key)
+
+
+PROVIDERS: Dict[str, ContentProvider] = {}
+
+
+def register_provider(provider: ContentProvider) -> ContentProvider:
+    """Add a provider; blocks go into entries in registration order"""
+    PROVIDERS[provider.name] = provider
+    return provider
+
+
+def _render_questions(date: Optional[datetime]) -> Rendered:
+    if date is None:
+        return get_questions_not_in_entry(), None
+    return get_questions_for_date(date), None
+
+
+def _render_stoic(date: Optional[datetime]) -> Rendered:
+    return render_stoic_entries(stoic_json_get_progress(), date)
+
+
+register_provider(
+    ContentProvider(
+        name="tarot",
+        arg="tarot",
+        render=lambda date: (pull_tarot_card(), None),
+        inputs=(TAROT_FILE,),
+        invalidation="date",
+        exclusion_re=r"^Tarot:.+$",
+        template_suffix="\n",
+    )
+)
+register_provider(
+    ContentProvider(
+        name="zodiac",
+        arg="zodiac",
+        render=lambda date: (get_zodiac_line(date), None),
+        invalidation="date",
+        cost_ms=LOCATION_BUDGET_MS,
+        exclusion_re=r"^Zodiac:.+$",
+    )
+)
+register_provider(
+    ContentProvider(
+        name="questions",
+        arg="questions",
+        render=_render_questions,
+        inputs=(QUESTIONS_DAILY_FILE, QUESTIONS_WEEKLY_FILE, QUESTIONS_MONTHLY_FILE),
+        # Cheap to render, and leaves out questions already in the entry
+        invalidation="none",
+    )
+)
+register_provider(
+    ContentProvider(
+        name="stoic",
+        arg="stoic_prompt",
+        render=_render_stoic,
+        inputs=(STOICS_FILE, STOICS_PROGRESS_FILE),
+        invalidation="mtime",
+        cost_ms=2.0,
+        exclusion_re=r"^- Daily Stoic Prompt,.*",
+        commit=stoic_json_set_progress,
+        dump_pending=progress_to_json,
+        load_pending=progress_from_json,
+    )
+)
+
+
+def needed_providers(entry_content: Optional[str] = None) -> List[ContentProvider]:
+    """Providers asked for, leaving out those whose marker is already in the entry"""
+    state = get_state()
+    return [
+        provider
+        for provider in PROVIDERS.values()
+        if state.args[provider.arg]
+        and not (
+            entry_content is not None
+            and provider.exclusion_re
+            and re.search(provider.exclusion_re, entry_content, flags=re.MULTILINE)
+        )
+    ]
+
+
+def _load_provider_cache(file_path: str) -> dict:
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_provider_outputs(outputs: Dict[str, dict]) -> None:
+    """Merge newly rendered outputs into the cache file"""
+    cache_path = get_state().reference_file(PROVIDER_CACHE_FILE)
+    with locked(cache_path):
+        cache = _load_provider_cache(cache_path)
+        cache.update(outputs)
+        atomic_write(cache_path, json.dumps(cache))
+
+
+def _cache_slot(provider: ContentProvider, date: Optional[datetime]) -> str:
+    # Outputs for today's entry and for a new entry's template are kept apart,
+    # as the service renders both
+    return provider.name if date is None else f"{provider.name}@template"
+
+
+def _timed_render(provider: ContentProvider, date: Optional[datetime]) -> Rendered:
+    started = time.perf_counter()
+    rendered = provider.render(date)
+    observe(
+        "provider_duration_seconds",
+        time.perf_counter() - started,
+        provider=provider.name,
+    )
+    return rendered
+
+
+def run_providers(
+    providers: List[ContentProvider],
+    date: Optional[datetime] = None,
+    read_only: bool = False,
+) -> Dict[str, Rendered]:
+    """Render providers for a date (today if None), reusing cached outputs
+
+    New outputs are saved to the cache unless read_only (or in test mode).
+    """
+    state = get_state()
+    cache = read_cached(
+        state.reference_file(PROVIDER_CACHE_FILE),
+        _load_provider_cache,
+        state.content_cache,
+    )
+    results: Dict[str, Rendered] = {}
+    misses = []
+    for provider in providers:
+        key = provider.cache_key(date)
+        cached = cache.get(_cache_slot(provider, date))
+        if key is not None and cached and cached["key"] == key:
+            pending = cached["pending"] and provider.load_pending(cached["pending"])
+            results[provider.name] = (cached["output"], pending)
+            increment("cache_hits_total", cache="provider", provider=provider.name)
+            continue
+        if key is not None:
+            increment("cache_misses_total", cache="provider", provider=provider.name)
+        misses.append((provider, key))
+
+    # Costly providers render in the background while the rest run here
+    background = [
+        provider
+        for provider, _ in misses
+        if len(misses) > 1 and provider.cost_ms >= PROVIDER_BACKGROUND_COST_MS
+    ]
+    futures = {}
+    if background:
+        pool = ThreadPoolExecutor(max_workers=len(background))
+        for provider in sorted(background, key=lambda p: p.cost_ms, reverse=True):
+            futures[provider.name] = pool.submit(
+                contextvars.copy_context().run, _timed_render, provider, date
+            )
+        pool.shutdown(wait=False)
+    for provider, _ in misses:
+        if provider.name not in futures:
+            results[provider.name] = _timed_render(provider, date)
+    for name, future in futures.items():
+        results[name] = future.result()
+
+    outputs = {
+        _cache_slot(provider, date): {
+            "key": key,
+            "output": results[provider.name][0],
+            "pending": results[provider.name][1]
+            and provider.dump_pending(results[provider.name][1]),
+        }
+        for provider, key in misses
+        if key is not None and results[provider.name][0]
+    }
+    if outputs and not read_only and not state.args["test"]:
+        save_provider_outputs(outputs)
+    # Keep providers in registration order
+    return {provider.name: results[provider.name] for provider in providers}
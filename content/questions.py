@@ -2,31 +2,55 @@
 
 import re
 from os import path
+from typing import Optional
+from datetime import datetime
 from config.state import get_state
 from config.settings import (
-    QUESTIONS_DAILY_TXT,
-    QUESTIONS_WEEKLY_TXT,
-    QUESTIONS_MONTHLY_TXT,
+    QUESTIONS_DAILY_FILE,
+    QUESTIONS_WEEKLY_FILE,
+    QUESTIONS_MONTHLY_FILE,
 )
-from utils.file_ops import read_question_file
+from utils.file_ops import read_cached, read_question_file
 from utils.dates import is_sunday, is_first_of_month
 
 
-def get_questions_not_in_entry() -> str:
-    """Get questions from appropriate files based on the date"""
-    content = ""
+def read_questions_for_date(date: Optional[datetime] = None) -> list:
+    """Read questions from the files that apply to the date (default: today)"""
+    state = get_state()
     question_list = []
 
+    def read_questions(file_name: str) -> list:
+        return read_cached(
+            state.reference_file(file_name), read_question_file, state.content_cache
+        )
+
     # Always read daily questions
-    question_list.extend(read_question_file(QUESTIONS_DAILY_TXT))
+    question_list.extend(read_questions(QUESTIONS_DAILY_FILE))
 
     # Add weekly questions on Sunday
-    if is_sunday():
-        question_list.extend(read_question_file(QUESTIONS_WEEKLY_TXT))
+    if is_sunday(date):
+        question_list.extend(read_questions(QUESTIONS_WEEKLY_FILE))
 
     # Add monthly questions on the first of the month
-    if is_first_of_month():
-        question_list.extend(read_question_file(QUESTIONS_MONTHLY_TXT))
+    if is_first_of_month(date):
+        question_list.extend(read_questions(QUESTIONS_MONTHLY_FILE))
+
+    return question_list
+
+
+def format_questions(question_list: list) -> str:
+    """Join questions into entry content, leaving room to answer after colons"""
+    return re.sub(r":\n", ": \n", "".join(question_list), flags=re.MULTILINE)
+
+
+def get_questions_for_date(date: Optional[datetime] = None) -> str:
+    """Get questions for a date without checking an existing entry"""
+    return format_questions(read_questions_for_date(date))
+
+
+def get_questions_not_in_entry() -> str:
+    """Get questions from appropriate files based on the date"""
+    question_list = read_questions_for_date()
 
     # Remove questions that are already in the entry
     state = get_state()
@@ -39,5 +63,4 @@ def get_questions_not_in_entry() -> str:
                 if line in question_list:
                     question_list.remove(line)
 
-    content = re.sub(r":\n", ": \n", "".join(question_list), flags=re.MULTILINE)
-    return content
+    return format_questions(question_list)
@@ -2,27 +2,32 @@
 
 import json
 import math
-import csv
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
-from config.settings import STOIC_CSV, STOIC_PROGRESS, STOIC_CATCHUP_RATE
+from config.settings import STOICS_FILE, STOICS_PROGRESS_FILE, STOIC_CATCHUP_RATE
 from config.state import get_state
+from utils import clock
+from utils.file_ops import read_cached, read_csv_rows
+from utils.locking import locked, atomic_write
 
 
 def days_until_catch_up(progress_day: int, catchup_rate: int) -> int:
-    today_day_of_year = datetime.now().timetuple().tm_yday
+    today_day_of_year = clock.now().timetuple().tm_yday
     days_behind = today_day_of_year - progress_day
     return math.ceil(days_behind / catchup_rate)
 
 
 def date_from_now(days_ahead: int) -> str:
-    target_date = datetime.now() + timedelta(days=days_ahead)
+    target_date = clock.now() + timedelta(days=days_ahead)
     return target_date.strftime("%m/%d")
 
 
 def stoic_json_get_progress() -> dict:
     """Read progress from JSON file or start from beginning if not found."""
     try:
-        with open(STOIC_PROGRESS, "r", encoding="utf-8") as file:
+        with open(
+            get_state().reference_file(STOICS_PROGRESS_FILE), "r", encoding="utf-8"
+        ) as file:
             progress = json.load(file)
             date = datetime.strptime(progress["updated_on"], "%Y-%m-%d")
             return {"day": progress["day"], "updated_on": date}
@@ -30,29 +35,51 @@ def stoic_json_get_progress() -> dict:
         return {"day": 1, "updated_on": datetime(2024, 1, 1)}
 
 
+def progress_to_json(progress: dict) -> dict:
+    """Stoic progress in the form it is stored as JSON"""
+    return {
+        "day": progress["day"],
+        "updated_on": progress["updated_on"].strftime("%Y-%m-%d"),
+    }
+
+
+def progress_from_json(data: dict) -> dict:
+    """Stoic progress read back from JSON"""
+    return {
+        "day": data["day"],
+        "updated_on": datetime.strptime(data["updated_on"], "%Y-%m-%d"),
+    }
+
+
 def stoic_json_set_progress(progress):
     """Save progress if applicable"""
     state = get_state()
-    current_date = datetime.now().date()
+    current_date = clock.now().date()
     saved_date = progress["updated_on"].date()
 
     if current_date != saved_date:
         new_progress = {
             "day": progress["day"],
-            "updated_on": datetime.now().strftime("%Y-%m-%d"),
+            "updated_on": clock.now().strftime("%Y-%m-%d"),
         }
         if state.args["test"]:
             print("json.dump:", new_progress)
             return
-        with open(STOIC_PROGRESS, "w", encoding="utf-8") as file:
-            json.dump(new_progress, file)
+        progress_file = state.reference_file(STOICS_PROGRESS_FILE)
+        with locked(progress_file):
+            # Another invocation may have saved progress since we read it
+            if stoic_json_get_progress()["updated_on"].date() == current_date:
+                return
+            atomic_write(progress_file, json.dumps(new_progress))
 
 
-def get_number_of_entries_to_load(progress_day: int) -> int:
+def get_number_of_entries_to_load(
+    progress_day: int, date: Optional[datetime] = None
+) -> int:
     """Return the number of entries to load based on progress relative to current date, within bounds of catchup rate"""
     if progress_day > 366:
         progress_day = ((progress_day - 1) % 366) + 1
-    today = datetime.now().timetuple().tm_yday
+    today = (date or clock.now()).timetuple().tm_yday
     if today < progress_day < today + STOIC_CATCHUP_RATE:
         return progress_day - today
     if today == progress_day:
@@ -60,15 +87,16 @@ def get_number_of_entries_to_load(progress_day: int) -> int:
     return STOIC_CATCHUP_RATE
 
 
-def get_stoic_entries() -> str:
-    """Return the relevant entry from stoics.csv"""
-    progress = stoic_json_get_progress()
-
-    with open(STOIC_CSV, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        entries = list(reader)
+def render_stoic_entries(
+    progress: dict, date: Optional[datetime] = None
+) -> Tuple[str, dict]:
+    """Render stoic prompts for a date, returning them with the advanced progress"""
+    state = get_state()
+    entries = read_cached(
+        state.reference_file(STOICS_FILE), read_csv_rows, state.content_cache
+    )
 
-    num_entries_to_load = get_number_of_entries_to_load(progress["day"])
+    num_entries_to_load = get_number_of_entries_to_load(progress["day"], date)
     result = "\n"
 
     for x in range(num_entries_to_load):
@@ -77,15 +105,22 @@ def get_stoic_entries() -> str:
         entry = day_entries[0] if day_entries else None
 
         if entry:
-            date = datetime.strptime(entry["Date"], "%m/%d")
+            # Parse within a leap year so 2/29 is valid
+            entry_date = datetime.strptime(f"2000/{entry['Date']}", "%Y/%m/%d")
             text = entry["Question"]
         else:
-            date = datetime.now()  # Fallback date
+            entry_date = date or clock.now()  # Fallback date
             text = f"No entry for day {day}."
 
-        result += f"- Daily Stoic Prompt, {date.strftime('%-m/%d')}:\n{text}\n"
+        result += f"- Daily Stoic Prompt, {entry_date.strftime('%-m/%d')}:\n{text}\n"
         result += "\t- Morning:\n\t\t- \n\t- Evening:\n\t\t- \n"
 
-    progress["day"] += num_entries_to_load
+    new_progress = dict(progress, day=progress["day"] + num_entries_to_load)
+    return result, new_progress
+
+
+def get_stoic_entries() -> str:
+    """Return the relevant entry from stoics.csv"""
+    result, progress = render_stoic_entries(stoic_json_get_progress())
     stoic_json_set_progress(progress)
     return result
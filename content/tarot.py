@@ -1,15 +1,18 @@
 """Tarot content functions"""
 
 import random
-import csv
-from config.settings import TAROT_CSV, TAROT_SKIP_COLUMNS, TAROT_COLUMN_MAX_LEN
+from config.settings import TAROT_FILE, TAROT_SKIP_COLUMNS, TAROT_COLUMN_MAX_LEN
+from config.state import get_state
+from utils.file_ops import read_cached, read_csv_rows
 
 
 def pull_tarot_card() -> str:
     """Pull a tarot card from the tarot.csv file"""
-    with open(TAROT_CSV, "r", encoding="utf-8") as f:
-        reader = list(csv.DictReader(f))
-        card = random.choice(reader)
+    state = get_state()
+    cards = read_cached(
+        state.reference_file(TAROT_FILE), read_csv_rows, state.content_cache
+    )
+    card = random.choice(cards)
 
     result = "Tarot: "
     for column, value in card.items():
@@ -1,7 +1,10 @@
 """Entry point for journal templating script"""
 
+import re
+import time
 import argparse
-from os import path
+from os import path, makedirs
+from typing import List, Optional
 from config.state import initialize_state, get_state
 from writer.entry import (
     create_morning_content,
@@ -9,15 +12,32 @@ from writer.entry import (
     update_entry_with_new_content,
     get_evening_update_string,
     move_stoics_to_end,
+    update_entry_with_providers,
+    prerender_next_morning,
 )
+from writer.export import EXPORT_FORMATS, EXPORT_EXTENSIONS, export_journal
+from writer.importer import import_journal
 from utils.file_ops import open_editor
-from content.tarot import pull_tarot_card
-from content.questions import get_questions_not_in_entry
-from content.stoic import get_stoic_entries
+from utils.staging import reconcile, start_flusher
+from utils.snapshots import get_snapshot_store
+from content.stoic import stoic_json_get_progress, days_until_catch_up
+from config.settings import (
+    PRERENDER_AFTER_EVENING,
+    GLOBAL_WORDCOUNT_GOAL,
+    STOIC_CATCHUP_RATE,
+    STOICS_PROGRESS_FILE,
+    METRICS_TEXTFILE,
+    METRICS_STATE_FILE,
+    LOCAL_STAGING_DIR,
+    IMPORT_CHECKPOINT_FILE,
+)
+from utils import clock
+from utils.metrics import timed, observe, set_gauge, write_metrics
+from writer.wordcount import get_ia_writer_style_wordcount_from_string
 
 
-def parse_arguments():
-    """Parse command line arguments"""
+def parse_arguments(argv: Optional[List[str]] = None):
+    """Parse command line arguments (from sys.argv unless argv is given)"""
     parser = argparse.ArgumentParser(description="Journal templating script")
     parser.add_argument(
         "-a",
@@ -74,8 +94,44 @@ def parse_arguments():
         default=False,
         help="skip review of entry from 8 weeks ago (even if it exists)",
     )
+    parser.add_argument(
+        "-P",
+        "--prerender",
+        default=False,
+        action="store_true",
+        help="pre-render tomorrow's morning template and exit (e.g. from cron)",
+    )
+    parser.add_argument(
+        "-x",
+        "--export",
+        choices=EXPORT_FORMATS,
+        help="export every entry as JSONL, a single Markdown file, or static HTML, and exit",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="file to export to (default: journal-export.<jsonl|md|html>)",
+    )
+    parser.add_argument(
+        "--export-workers",
+        type=int,
+        default=1,
+        help="parse entries in this many processes when exporting",
+    )
+    parser.add_argument(
+        "-i",
+        "--import",
+        dest="import_file",
+        help="import entries from another app's JSON, JSON Lines or Markdown export, and exit",
+    )
+    parser.add_argument(
+        "--import-workers",
+        type=int,
+        default=4,
+        help="write imported entries in this many threads",
+    )
 
-    args = vars(parser.parse_args())
+    args = vars(parser.parse_args(argv))
 
     if args["all"]:
         args["questions"] = True
@@ -85,10 +141,17 @@ def parse_arguments():
     return args
 
 
-def main():
-    """Main entry point"""
-    args = parse_arguments()
-    initialize_state(args)
+def stage_entries() -> None:
+    """Bring today's entry and the review into the staging directory, newer copy winning"""
+    state = get_state()
+    makedirs(state.path, exist_ok=True)
+    history = get_snapshot_store()
+    for title in (state.title_now, state.title_now_8_weeks_ago):
+        reconcile(f"{title}.txt", state.path, state.synced_path, history)
+
+
+def update_or_create_entry() -> bool:
+    """Add to today's entry if it exists, otherwise create it and return True"""
     state = get_state()
 
     if path.exists(state.entry_file_path):
@@ -98,23 +161,125 @@ def main():
             )
             if not state.args["do_not_move_stoics"]:
                 move_stoics_to_end()
-        if state.args["tarot"]:
-            update_entry_with_new_content(pull_tarot_card(), "\n", r"^Tarot:.+$")
-        if state.args["questions"]:
-            update_entry_with_new_content(get_questions_not_in_entry(), "\n")
-        if state.args["stoic_prompt"]:
-            update_entry_with_new_content(
-                get_stoic_entries(), "\n", r"^- Daily Stoic Prompt,.*"
+        update_entry_with_providers()
+        return False
+
+    create_entry(create_morning_content())
+    return True
+
+
+def run_command(started: float) -> None:
+    """Run what the arguments ask for"""
+    state = get_state()
+
+    if state.args["prerender"]:
+        with timed("prerender"):
+            prerender_next_morning()
+        return
+
+    if state.args["export"]:
+        output = (
+            state.args["output"]
+            or f"journal-export.{EXPORT_EXTENSIONS[state.args['export']]}"
+        )
+        with timed("export"):
+            count = export_journal(
+                state.synced_path or state.path,
+                state.args["export"],
+                output,
+                state.args["export_workers"],
             )
-    else:
-        initial_content = create_morning_content()
-        if not state.args["no_review"]:
-            open_editor(state.editor_8_weeks_ago_subprocess)
-        create_entry(initial_content)
+        print(f"Exported {count} entries to {output}")
+        return
 
-    if state.args["test"]:
+    if state.args["import_file"]:
+        with timed("import"):
+            stats = import_journal(
+                state.args["import_file"],
+                state.synced_path or state.path,
+                state.reference_file(IMPORT_CHECKPOINT_FILE),
+                workers=state.args["import_workers"],
+                history=get_snapshot_store(),
+            )
+        print(
+            f"Imported {stats['written']} entries in {stats['seconds']:.1f}s "
+            f"({stats['entries_per_second']:.0f} entries/s)"
+        )
+        if stats["resumed"]:
+            print(f"Resumed after {stats['resumed']} entries imported earlier")
+        if stats["appended"]:
+            print(f"Added imported text to {stats['appended']} existing entries")
+        if stats["invalid"]:
+            print(f"Ignored {stats['invalid']} items without a date or text")
         return
-    open_editor(state.editor_subprocess)
+
+    if state.synced_path:
+        with timed("staging"):
+            stage_entries()
+
+    prerender = PRERENDER_AFTER_EVENING and (
+        path.exists(state.entry_file_path)
+        and (state.is_evening or state.is_late_night)
+    )
+    with timed("entry"):
+        created = update_or_create_entry()
+
+    # Entry is written first, then the review and today's entry open together
+    with timed("editor"):
+        if created and not state.args["no_review"]:
+            open_editor(state.editor_8_weeks_ago_subprocess)
+        if state.args["test"]:
+            return
+        open_editor(state.editor_subprocess)
+    editor_launched = time.perf_counter()
+    if state.synced_path:
+        start_flusher(state.path, state.synced_path, get_snapshot_store().root)
+    print(f"Editor launched {(editor_launched - started) * 1000:.0f}ms after start")
+    if prerender:
+        with timed("prerender"):
+            prerender_next_morning()
+    with timed("snapshots"):
+        get_snapshot_store().prune_if_due()
+
+
+def write_run_metrics(started: float) -> None:
+    """Record the state of the entry and stoic progress and write the metrics textfile"""
+    state = get_state()
+    if path.exists(state.entry_file_path):
+        with open(state.entry_file_path, "r", encoding="utf-8") as file:
+            content = file.read()
+        set_gauge("entry_words", get_ia_writer_style_wordcount_from_string(content))
+        goals = re.findall(r"^Goal WC: (\d+)", content, flags=re.MULTILINE)
+        if goals:
+            set_gauge("entry_goal_words", int(goals[-1]))
+    set_gauge("wordcount_goal_words", GLOBAL_WORDCOUNT_GOAL)
+
+    if path.exists(state.reference_file(STOICS_PROGRESS_FILE)):
+        progress_day = ((stoic_json_get_progress()["day"] - 1) % 366) + 1
+        days_behind = clock.now().timetuple().tm_yday - progress_day
+        set_gauge("stoic_days_behind", max(0, days_behind))
+        set_gauge(
+            "stoic_days_until_caught_up",
+            max(0, days_until_catch_up(progress_day, STOIC_CATCHUP_RATE)),
+        )
+
+    observe("stage_duration_seconds", time.perf_counter() - started, stage="total")
+    try:
+        write_metrics(METRICS_TEXTFILE, state.reference_file(METRICS_STATE_FILE))
+    except OSError as e:
+        print(f"Warning: could not write metrics: {e}")
+
+
+def main():
+    """Main entry point"""
+    started = time.perf_counter()
+    args = parse_arguments()
+    initialize_state(args, staging_dir=LOCAL_STAGING_DIR)
+    try:
+        run_command(started)
+    finally:
+        if METRICS_TEXTFILE and not get_state().args["test"]:
+            write_run_metrics(started)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""Local WSGI service rendering and updating journal entries for many users
+
+Usage: python -m service.app --root DIR [--host 127.0.0.1] [--port 8750]
+
+Each user has a directory under the root holding entries/ (the journal) and
+personal/ (reference files and stoic progress, as for main.py).
+
+Routes:
+    GET  /<user>/template  render a morning template without saving anything
+    GET  /<user>/entry     return today's entry
+    POST /<user>/entry     create or update today's entry, like running main.py
+
+Content is chosen with query string flags: tarot, questions, stoic_prompt and
+do_not_move_stoics (e.g. /alex/entry?tarot=1&stoic_prompt=1).
+"""
+
+import os
+import re
+import argparse
+import threading
+import contextvars
+from typing import Tuple
+from urllib.parse import parse_qs
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+from config.settings import CONTENT_CACHE_ENTRIES
+from config.state import initialize_state, get_state
+from utils.cache import LRUCache
+from writer.entry import build_morning_content
+from main import parse_arguments, update_or_create_entry
+
+ROUTE_RE = re.compile(r"^/([A-Za-z0-9_-]+)/(template|entry)$")
+REQUEST_FLAGS = ("tarot", "questions", "stoic_prompt", "do_not_move_stoics")
+MAX_CACHED_USERS = 256
+
+
+class TemplateService:
+    """WSGI application serving journal entries for the users under root"""
+
+    def __init__(
+        self,
+        root: str,
+        max_users: int = MAX_CACHED_USERS,
+        cache_entries: int = CONTENT_CACHE_ENTRIES,
+    ):
+        self.root = root
+        self.cache_entries = cache_entries
+        # Each user's parsed reference files and update lock, evicted together
+        self.users = LRUCache(max_users)
+        self._users_lock = threading.Lock()
+
+    def _user(self, user: str) -> Tuple[LRUCache, threading.Lock]:
+        with self._users_lock:
+            return self.users.get_or_create(
+                user, lambda: (LRUCache(self.cache_entries), threading.Lock())
+            )
+
+    def user_lock(self, user: str) -> threading.Lock:
+        """Lock serializing entry updates for one user"""
+        return self._user(user)[1]
+
+    def user_cache(self, user: str) -> LRUCache:
+        """Parsed reference files for one user"""
+        return self._user(user)[0]
+
+    def __call__(self, environ, start_response):
+        # Each request gets its own state and clock
+        return contextvars.copy_context().run(self.handle, environ, start_response)
+
+    def handle(self, environ, start_response):
+        """Route a request to the user's entry or template"""
+        match = ROUTE_RE.match(environ.get("PATH_INFO", ""))
+        if not match:
+            return respond(start_response, "404 Not Found", "Not found\n")
+        user, resource = match.groups()
+        user_dir = os.path.join(self.root, user)
+        if not os.path.isdir(user_dir):
+            return respond(start_response, "404 Not Found", f"Unknown user {user}\n")
+
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        args = parse_arguments([])
+        for flag in REQUEST_FLAGS:
+            args[flag] = query.get(flag, ["0"])[0] not in ("", "0", "false")
+        initialize_state(
+            args,
+            platform_settings={
+                "path": os.path.join(user_dir, "entries"),
+                "editor_subprocess": [],
+            },
+            reference_dir=os.path.join(user_dir, "personal"),
+            content_cache=self.user_cache(user),
+        )
+        state = get_state()
+        method = environ["REQUEST_METHOD"]
+
+        if resource == "template" and method == "GET":
+            content, _ = build_morning_content(
+                state.title_now, state.timestamp_hhmm, state.base_date, read_only=True
+            )
+            return respond(start_response, "200 OK", content)
+        if resource == "entry" and method == "POST":
+            with self.user_lock(user):
+                update_or_create_entry()
+        elif resource != "entry" or method != "GET":
+            return respond(start_response, "405 Method Not Allowed", "Not allowed\n")
+
+        if not os.path.exists(state.entry_file_path):
+            return respond(start_response, "404 Not Found", "No entry yet\n")
+        with open(state.entry_file_path, "r", encoding="utf-8") as file:
+            return respond(start_response, "200 OK", file.read())
+
+
+def respond(start_response, status: str, body: str) -> list:
+    """Send a plain text response"""
+    data = body.encode("utf-8")
+    start_response(
+        status,
+        [
+            ("Content-Type", "text/plain; charset=utf-8"),
+            ("Content-Length", str(len(data))),
+        ],
+    )
+    return [data]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI server handling each request in its own thread"""
+
+    daemon_threads = True
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that does not log every request"""
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def make_service_server(root: str, host: str, port: int, quiet: bool = False):
+    """Create a threaded server for the template service"""
+    return make_server(
+        host,
+        port,
+        TemplateService(root),
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietRequestHandler if quiet else WSGIRequestHandler,
+    )
+
+
+def main():
+    """Run the template service"""
+    parser = argparse.ArgumentParser(description="Journal template service")
+    parser.add_argument("--root", required=True, help="directory of user folders")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    args = parser.parse_args()
+
+    server = make_service_server(args.root, args.host, args.port)
+    print(f"Serving journals in {args.root} on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import pytest  # pylint: disable=W0611,E0401
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(tmp_path_factory, monkeypatch):
+    """Keep lock files out of the home directory, here and in subprocesses"""
+    directory = str(tmp_path_factory.mktemp("locks"))
+    monkeypatch.setenv("JOURNAL_LOCK_DIR", directory)
+    monkeypatch.setattr("config.settings.LOCK_DIR", directory)
+    return directory
@@ -0,0 +1,146 @@
+import math
+import random
+from array import array
+from datetime import datetime, timedelta, timezone
+import pytest  # pylint: disable=W0611,E0401
+from config.settings import EPHEMERIS_FILE
+from config.state import initialize_state
+from content import ephemeris
+from content.ephemeris import BODIES, HEADER, EphemerisTable, get_table, sign_of
+
+UTC = timezone.utc
+
+
+def make_table(sun_positions, step_hours=6) -> EphemerisTable:
+    steps = len(sun_positions)
+    return EphemerisTable(
+        year=2025,
+        step_hours=step_hours,
+        latitude=45.5,
+        longitude=-122.7,
+        positions={
+            body: array("f", sun_positions if body == "Sun" else [0.0] * steps)
+            for body in BODIES
+        },
+        moon_phase=array("f", [10.0 * n for n in range(steps)]),
+        sunrise=array("d", [datetime(2025, 1, 1, 15, tzinfo=UTC).timestamp()]),
+        sunset=array("d", [math.nan]),
+    )
+
+
+def test_sign_of():
+    """Test that ecliptic longitudes map to zodiac signs"""
+    test_cases = [
+        (0.0, "Aries"),
+        (29.99, "Aries"),
+        (30.0, "Taurus"),
+        (200.0, "Libra"),
+        (359.9, "Pisces"),
+        (360.0, "Aries"),
+    ]
+
+    for longitude, expected_sign in test_cases:
+        assert sign_of(longitude) == expected_sign, longitude
+
+
+def test_interpolation():
+    """Test that positions and phase interpolate between rows, wrapping at 360"""
+    table = make_table([350.0, 10.0, 20.0])
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+
+    assert table.position("Sun", start) == pytest.approx(350.0)
+    assert table.position("Sun", start + timedelta(hours=3)) == pytest.approx(0.0)
+    assert table.position("Sun", start + timedelta(hours=4.5)) == pytest.approx(5.0)
+    assert table.position("Sun", start + timedelta(hours=12)) == pytest.approx(20.0)
+    assert table.phase(start + timedelta(hours=9)) == pytest.approx(15.0)
+    with pytest.raises(ValueError):
+        table.position("Sun", start + timedelta(hours=13))
+
+
+def test_sun_times():
+    """Test that missing sunrise/sunset values come back as None"""
+    table = make_table([0.0, 1.0, 2.0])
+    times = table.sun_times(datetime(2025, 1, 1, 8, tzinfo=UTC))
+    assert times["sunrise"] == datetime(2025, 1, 1, 15, tzinfo=UTC)
+    assert times["sunset"] is None
+
+
+def test_sun_times_use_local_date():
+    """Test that a US evening, already the next day in UTC, gets its own day's row"""
+    table = make_table([0.0, 1.0, 2.0])
+    table.sunrise = array("d", [1.0 * day for day in range(365)])
+    table.sunset = array("d", [math.nan] * 365)
+    pacific = timezone(timedelta(hours=-8))
+
+    evening = datetime(2025, 3, 1, 20, tzinfo=pacific)
+    assert evening.astimezone(UTC).day == 2
+    assert table.sun_times(evening)["sunrise"].timestamp() == 59.0
+    new_years_eve = datetime(2025, 12, 31, 20, tzinfo=pacific)
+    assert table.sun_times(new_years_eve)["sunrise"].timestamp() == 364.0
+    # The run clock is naive local time
+    assert table.sun_times(datetime(2025, 3, 1, 20))["sunrise"].timestamp() == 59.0
+    with pytest.raises(ValueError):
+        table.sun_times(datetime(2026, 1, 1, 1, tzinfo=pacific))
+
+
+def test_save_and_load(tmp_path):
+    """Test that a table survives a round trip through its file"""
+    table = make_table([350.0, 10.0, 20.0])
+    file_path = str(tmp_path / "table.bin")
+    table.save(file_path)
+    loaded = EphemerisTable.load(file_path)
+    assert loaded.year == 2025 and loaded.latitude == 45.5
+    assert list(loaded.positions["Sun"]) == list(table.positions["Sun"])
+    assert math.isnan(loaded.sunset[0])
+
+
+def test_damaged_table_is_regenerated(tmp_path, monkeypatch):
+    """Test that a table cut short by an interrupted run is generated again"""
+    table = make_table([350.0, 10.0, 20.0])
+    monkeypatch.setattr(ephemeris, "generate_table", lambda *args: table)
+    initialize_state(
+        {"test": False},
+        platform_settings={"path": str(tmp_path), "editor_subprocess": []},
+        reference_dir=str(tmp_path),
+    )
+    name = EPHEMERIS_FILE.format(year=2025, latitude=45.5, longitude=-122.7)
+    file_path = tmp_path / name
+    table.save(str(file_path))
+    data = file_path.read_bytes()
+    for length in (10, HEADER.size + 5, len(data) - 3):
+        file_path.write_bytes(data[:length])
+        with pytest.raises(ValueError):
+            EphemerisTable.load(str(file_path))
+        assert get_table(2025, 45.5, -122.7) is table
+        assert file_path.read_bytes() == data
+
+
+def test_table_matches_ephem():
+    """Test that interpolated table reads agree with direct ephem computations"""
+    ephem = pytest.importorskip("ephem")
+    from content.ephemeris import (  # pylint: disable=import-outside-toplevel
+        compute_position,
+        generate_table,
+    )
+
+    table = generate_table(2025, 45.5, -122.7)
+    rng = random.Random(2025)
+    for _ in range(50):
+        moment = datetime(2025, 1, 1, tzinfo=UTC) + timedelta(
+            minutes=rng.randrange(364 * 24 * 60)
+        )
+        for body in BODIES:
+            expected = compute_position(getattr(ephem, body)(), moment)
+            difference = (table.position(body, moment) - expected + 180) % 360 - 180
+            # The moon moves about 13 degrees a day, everything else far less
+            assert abs(difference) < (0.1 if body == "Moon" else 0.01), body
+
+        moon = ephem.Moon(ephem.Date(moment.replace(tzinfo=None)))
+        assert table.phase(moment) == pytest.approx(moon.phase, abs=1.0)
+
+    observer = ephem.Observer()
+    observer.lat, observer.lon = "45.5", "-122.7"
+    observer.date = ephem.Date(datetime(2025, 6, 21, 8))
+    sunrise = ephem.Date(observer.next_rising(ephem.Sun())).datetime()
+    table_sunrise = table.sun_times(datetime(2025, 6, 21, 12, tzinfo=UTC))["sunrise"]
+    assert abs(table_sunrise.replace(tzinfo=None) - sunrise) < timedelta(minutes=1)
@@ -0,0 +1,112 @@
+import os
+from datetime import datetime
+import pytest  # pylint: disable=W0611,E0401
+from config.state import get_state, initialize_state
+from content import providers
+from content.providers import ContentProvider, needed_providers, run_providers
+from writer.entry import update_entry_with_providers
+
+
+@pytest.fixture
+def renders(tmp_path, monkeypatch):
+    """Register counting providers for each invalidation rule"""
+    (tmp_path / "input.txt").write_text("input", encoding="utf-8")
+    counts = {}
+
+    def render(name):
+        def count(date):
+            counts[name] = counts.get(name, 0) + 1
+            return f"{name.capitalize()}: {counts[name]}\n", None
+
+        return count
+
+    monkeypatch.setattr(providers, "PROVIDERS", {})
+    for rule in providers.INVALIDATION_RULES:
+        providers.register_provider(
+            ContentProvider(
+                name=rule,
+                arg=rule,
+                render=render(rule),
+                inputs=("input.txt",),
+                invalidation=rule,
+                exclusion_re=rf"^{rule.capitalize()}:",
+            )
+        )
+    initialize_state(
+        {"test": False, "date": True, "mtime": True, "none": True},
+        now=datetime(2025, 3, 1, 8, 0),
+        platform_settings={"path": str(tmp_path), "editor_subprocess": []},
+        reference_dir=str(tmp_path),
+    )
+    return counts
+
+
+def test_outputs_are_reused_across_runs(renders, tmp_path):
+    """Test that cached outputs are reused until their invalidation rule applies"""
+    run_providers(needed_providers())
+    second = run_providers(needed_providers())
+    assert renders == {"date": 1, "mtime": 1, "none": 2}
+    assert second["date"] == ("Date: 1\n", None)
+
+    os.utime(tmp_path / "input.txt", ns=(0, 0))
+    run_providers(needed_providers())
+    assert renders == {"date": 1, "mtime": 2, "none": 3}
+
+    run_providers(needed_providers(), datetime(2025, 3, 2))
+    assert renders == {"date": 2, "mtime": 3, "none": 4}
+
+
+def test_template_and_entry_outputs_are_cached_apart(renders):
+    """Test that output for a new entry's template is not reused for today's entry"""
+    run_providers(needed_providers())
+    run_providers(needed_providers(), datetime(2025, 3, 1))
+    run_providers(needed_providers(), datetime(2025, 3, 1))
+    run_providers(needed_providers())
+    assert renders == {"date": 2, "mtime": 2, "none": 4}
+
+
+def test_pending_state_is_committed_with_its_block(renders, monkeypatch):
+    """Test that pending state is only committed when its block goes into the entry"""
+    entry_path = get_state().entry_file_path
+    commits = []
+
+    def render(date):
+        if race:
+            # Another run adds the block while this one renders it
+            with open(entry_path, "a", encoding="utf-8") as file:
+                file.write("Stoic: 1\n")
+        return "Stoic: 1\n", {"day": len(commits) + 1}
+
+    monkeypatch.setattr(providers, "PROVIDERS", {})
+    providers.register_provider(
+        ContentProvider(
+            name="stoic",
+            arg="none",
+            render=render,
+            exclusion_re=r"^Stoic:",
+            commit=commits.append,
+        )
+    )
+    for race in (True, False):
+        with open(entry_path, "w", encoding="utf-8") as file:
+            file.write("Title\n")
+        update_entry_with_providers()
+        with open(entry_path, "r", encoding="utf-8") as file:
+            assert file.read().count("Stoic: 1") == 1
+    assert commits == [{"day": 1}]
+
+
+def test_providers_already_in_entry_are_skipped(renders):
+    """Test that only providers whose marker is missing from the entry run"""
+    needed = needed_providers("Title\nDate: 1\n\nNone: 1\n")
+    assert [provider.name for provider in needed] == ["mtime"]
+    assert list(run_providers(needed)) == ["mtime"]
+    assert renders == {"mtime": 1}
+
+
+def test_unknown_invalidation_rule():
+    """Test that providers must use one of the invalidation rules"""
+    with pytest.raises(ValueError):
+        ContentProvider(
+            name="x", arg="x", render=lambda date: ("", None), invalidation="hourly"
+        )
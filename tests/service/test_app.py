@@ -0,0 +1,106 @@
+import io
+import os
+from contextlib import redirect_stdout
+from wsgiref.util import setup_testing_defaults
+import pytest  # pylint: disable=W0611,E0401
+from service.app import TemplateService
+from utils import metrics
+from tools.simulate import prepare_reference_dir
+
+
+def call(app, method: str, url: str):
+    path_info, _, query = url.partition("?")
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path_info, "QUERY_STRING": query}
+    setup_testing_defaults(environ)
+    response = {}
+
+    def start_response(status, headers):
+        response["status"] = status
+
+    with redirect_stdout(io.StringIO()):
+        body = b"".join(app(environ, start_response)).decode("utf-8")
+    return response["status"], body
+
+
+@pytest.fixture(name="app")
+def fixture_app(tmp_path):
+    for user in ("alex", "sam"):
+        os.makedirs(tmp_path / user / "entries")
+        prepare_reference_dir(str(tmp_path / user / "personal"))
+    return TemplateService(str(tmp_path), cache_entries=3)
+
+
+def test_users_are_kept_apart(app, tmp_path):
+    """Test that an entry created for one user is not visible to another"""
+    status, body = call(app, "POST", "/alex/entry?stoic_prompt=1")
+    assert status.startswith("200")
+    assert "#MorningPages" in body and "Daily Stoic Prompt" in body
+    assert call(app, "GET", "/sam/entry")[0].startswith("404")
+    assert len(os.listdir(tmp_path / "alex" / "entries")) == 1
+    assert not os.listdir(tmp_path / "sam" / "entries")
+    assert os.path.exists(tmp_path / "alex" / "personal" / "stoic_progress.json")
+    assert not os.path.exists(tmp_path / "sam" / "personal" / "stoic_progress.json")
+
+
+def test_template_does_not_write(app, tmp_path):
+    """Test that rendering a template leaves the user's files alone"""
+    personal = tmp_path / "sam" / "personal"
+    before = {p.name: p.stat().st_mtime_ns for p in personal.iterdir()}
+    status, body = call(app, "GET", "/sam/template?tarot=1&questions=1&stoic_prompt=1")
+    assert status.startswith("200")
+    assert "Tarot: " in body
+    assert not os.listdir(tmp_path / "sam" / "entries")
+    assert {p.name: p.stat().st_mtime_ns for p in personal.iterdir()} == before
+
+
+def test_parsed_content_is_cached_per_user(app):
+    """Test that reference files are parsed once per user and the cache stays bounded"""
+    for _ in range(3):
+        call(app, "GET", "/alex/template?tarot=1&questions=1&stoic_prompt=1")
+    cache = app.user_cache("alex")
+    assert len(cache) <= 3
+    assert cache.hits > 0
+
+
+def test_unknown_routes(app):
+    """Test that unknown users, paths and methods are rejected"""
+    assert call(app, "GET", "/nobody/entry")[0].startswith("404")
+    assert call(app, "GET", "/../etc/entry")[0].startswith("404")
+    assert call(app, "DELETE", "/alex/entry")[0].startswith("405")
+
+
+def test_users_are_evicted_with_their_locks(tmp_path):
+    """Test that the caches and locks of least recently seen users are dropped"""
+    for user in ("alex", "sam"):
+        os.makedirs(tmp_path / user / "entries")
+        prepare_reference_dir(str(tmp_path / user / "personal"))
+    app = TemplateService(str(tmp_path), max_users=1)
+    assert call(app, "POST", "/alex/entry")[0].startswith("200")
+    alex_lock = app.user_lock("alex")
+    assert app.user_lock("alex") is alex_lock
+    assert call(app, "POST", "/sam/entry")[0].startswith("200")
+    assert len(app.users) == 1
+    assert app.user_lock("alex") is not alex_lock
+
+
+def test_metrics_stay_bounded(app):
+    """Test that metrics recorded by many requests take the same memory"""
+
+    def recorded():
+        # pylint: disable=protected-access
+        return {
+            key: (len(series["buckets"]), series["count"])
+            for key, series in metrics._observations.items()
+        }
+
+    for _ in range(20):
+        call(app, "GET", "/alex/template?questions=1")
+    before = recorded()
+    for _ in range(200):
+        call(app, "GET", "/alex/template?questions=1")
+    after = recorded()
+    assert before.keys() == after.keys()
+    assert {buckets for buckets, _ in after.values()} == {len(metrics.BUCKETS) + 1}
+    assert sum(count for _, count in after.values()) > sum(
+        count for _, count in before.values()
+    )
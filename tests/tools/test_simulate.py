@@ -0,0 +1,30 @@
+import sys
+import subprocess
+from os import path
+import pytest  # pylint: disable=W0611,E0401
+
+REPO_DIR = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+
+
+def run_simulation(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "tools.simulate", *args],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+
+def test_simulation_across_year_rollover():
+    """Test that morning, evening and late night runs stay consistent across Dec 31"""
+    result = run_simulation("--days", "45", "--start", "2024-12-10")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "No inconsistencies found" in result.stdout
+
+
+def test_simulation_across_leap_day():
+    """Test that the stoic prompt for 2/29 renders in leap and non-leap years"""
+    for start in ("2024-02-20", "2025-02-20"):
+        result = run_simulation("--days", "15", "--start", start, "--skip-every", "3")
+        assert result.returncode == 0, result.stdout + result.stderr
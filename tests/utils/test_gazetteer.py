@@ -0,0 +1,110 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest  # pylint: disable=W0611,E0401
+from utils.gazetteer import Gazetteer, build_gazetteer
+
+CENSUS_SOURCE = "\n".join(
+    "\t".join(row)
+    for row in [
+        ("GEOID", "ALAND", "AWATER", "ALAND_SQMI", "AWATER_SQMI", "INTPTLAT", "INTPTLONG "),
+        ("10001", "1650573", "0", "0.637", "0.0", "40.750742", "-73.996530"),
+        ("00601", "166847909", "799292", "64.42", "0.309", "18.180555", "-66.749961"),
+        ("99950", "13224437", "0", "5.106", "0.0", "55.542007", "-131.432682"),
+    ]
+)
+
+
+@pytest.fixture(name="gazetteer")
+def fixture_gazetteer(tmp_path):
+    source = tmp_path / "zcta.txt"
+    source.write_text(CENSUS_SOURCE, encoding="utf-8")
+    dest = tmp_path / "zip_gazetteer.bin"
+    assert build_gazetteer(str(source), str(dest)) == 3
+    return Gazetteer(str(dest))
+
+
+def test_lookup(gazetteer):
+    """Test that ZIP codes resolve to their coordinates, including leading zeros"""
+    test_cases = [
+        ("10001", 40.750742, -73.996530),
+        ("00601", 18.180555, -66.749961),
+        ("99950", 55.542007, -131.432682),
+    ]
+
+    for zipcode, latitude, longitude in test_cases:
+        location = gazetteer.lookup(zipcode)
+        assert location["zipcode"] == zipcode
+        assert location["latitude"] == pytest.approx(latitude, abs=1e-4)
+        assert location["longitude"] == pytest.approx(longitude, abs=1e-4)
+
+
+def test_lookup_misses(gazetteer):
+    """Test that unknown or malformed ZIP codes are not found"""
+    malformed = ("1001", "010001", "0601", "１０００１", "10001 ", "+1001", "")
+    for zipcode in ("00000", "10002", "99999", "abcde") + malformed:
+        assert gazetteer.lookup(zipcode) is None, zipcode
+
+
+def test_build_from_csv(tmp_path):
+    """Test that a plain CSV with zipcode/latitude/longitude columns builds"""
+    source = tmp_path / "zips.csv"
+    source.write_text("zipcode,latitude,longitude\n97201,45.5,-122.7\n", encoding="utf-8")
+    dest = tmp_path / "zips.bin"
+    build_gazetteer(str(source), str(dest))
+    assert Gazetteer(str(dest)).lookup("97201")["latitude"] == pytest.approx(45.5)
+
+
+def test_http_fallback(monkeypatch):
+    """Test that ZIP codes missing offline are looked up on a stand-in server"""
+    pytest.importorskip("netifaces")
+    pytest.importorskip("requests")
+    from utils import network  # pylint: disable=import-outside-toplevel
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            found = self.path == "/us/97201"
+            body = json.dumps(
+                {"places": [{"latitude": "45.5", "longitude": "-122.7"}]}
+            ).encode("utf-8")
+            self.send_response(200 if found else 404)
+            self.end_headers()
+            self.wfile.write(body if found else b"{}")
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/us/{{zipcode}}"
+    monkeypatch.setattr(network, "lookup_zip", lambda zipcode: None)
+    try:
+        assert network.get_lat_lon_from_zip("97201", url)["latitude"] == 45.5
+        with pytest.raises(ValueError):
+            network.get_lat_lon_from_zip("00000", url)
+        with pytest.raises(ValueError):
+            network.get_lat_lon_from_zip("97201", None)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_bundled_gazetteer_resolves_offline(monkeypatch):
+    """Test that the bundled gazetteer answers without any HTTP fallback"""
+    from utils import gazetteer  # pylint: disable=import-outside-toplevel
+
+    monkeypatch.setattr(gazetteer, "_gazetteer", None)
+    for zipcode, latitude, longitude in [
+        ("10001", 40.75, -74.0),
+        ("00501", 40.82, -73.05),
+        ("97201", 45.51, -122.69),
+    ]:
+        location = gazetteer.lookup_zip(zipcode)
+        assert location["latitude"] == pytest.approx(latitude, abs=0.05)
+        assert location["longitude"] == pytest.approx(longitude, abs=0.05)
+
+    pytest.importorskip("netifaces")
+    pytest.importorskip("requests")
+    from utils import network  # pylint: disable=import-outside-toplevel
+
+    assert network.get_lat_lon_from_zip("97201", None)["zipcode"] == "97201"
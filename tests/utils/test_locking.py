@@ -0,0 +1,59 @@
+import os
+import stat
+import pytest  # pylint: disable=W0611,E0401
+from config.settings import LOCK_TIMEOUT_SECONDS
+from utils import locking
+from tools.stress_locks import stress
+
+pytestmark = pytest.mark.skipif(locking.fcntl is None, reason="needs fcntl")
+
+
+def test_concurrent_updates_lose_nothing(tmp_path):
+    """Test that concurrent read-modify-write updates keep every edit"""
+    report = stress(str(tmp_path), processes=8, updates=80)
+    assert report["lost"] == []
+    assert report["max_wait"] < LOCK_TIMEOUT_SECONDS
+    assert os.listdir(tmp_path / "locks") == []
+
+
+def test_lock_wait_is_bounded(tmp_path):
+    """Test that waiting for a held lock gives up after the timeout"""
+    file_path = str(tmp_path / "entry.txt")
+    with locking.locked(file_path):
+        with pytest.raises(TimeoutError):
+            with locking.locked(file_path, timeout=0.05):
+                pass
+    with locking.locked(file_path) as waited:
+        assert waited < 0.05
+
+
+def test_lock_files_are_removed(tmp_path, lock_dir):
+    """Test that a lock's sidecar file only exists while the lock is held"""
+    for name in ("a.txt", "b.txt", "a.txt"):
+        with locking.locked(str(tmp_path / name)):
+            assert len(os.listdir(lock_dir)) == 1
+    assert os.listdir(lock_dir) == []
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    """Test that atomic writes replace the file without leftovers"""
+    file_path = tmp_path / "entry.txt"
+    file_path.write_text("old", encoding="utf-8")
+    locking.atomic_write(str(file_path), "new")
+    assert file_path.read_text(encoding="utf-8") == "new"
+    assert [p.name for p in tmp_path.iterdir()] == ["entry.txt"]
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    """Test that replaced files keep their mode and new ones follow the umask"""
+    file_path = tmp_path / "entry.txt"
+    file_path.write_text("old", encoding="utf-8")
+    file_path.chmod(0o640)
+    locking.atomic_write(str(file_path), "new")
+    assert stat.S_IMODE(file_path.stat().st_mode) == 0o640
+
+    new_path = tmp_path / "new.txt"
+    locking.atomic_write(str(new_path), "new")
+    umask = os.umask(0o022)
+    os.umask(umask)
+    assert stat.S_IMODE(new_path.stat().st_mode) == 0o666 & ~umask
@@ -0,0 +1,71 @@
+import threading
+import pytest  # pylint: disable=W0611,E0401
+from utils import metrics
+from utils.cache import LRUCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_run():
+    """Start from a run with nothing recorded by other tests"""
+    # pylint: disable=protected-access
+    for values in (metrics._counters, metrics._gauges, metrics._observations):
+        values.clear()
+
+
+def run_once(tmp_path, seconds: float) -> str:
+    metrics.increment("entries_updated_total")
+    metrics.set_gauge("entry_words", 812)
+    metrics.observe("stage_duration_seconds", seconds, stage="entry")
+    textfile = tmp_path / "journal.prom"
+    metrics.write_metrics(str(textfile), str(tmp_path / "metrics.json"))
+    return textfile.read_text(encoding="utf-8")
+
+
+def test_totals_accumulate_across_runs(tmp_path):
+    """Test that counters and histograms add up over runs while gauges are replaced"""
+    run_once(tmp_path, 0.003)
+    text = run_once(tmp_path, 0.3)
+    lines = text.splitlines()
+
+    assert "journal_runs_total 2" in lines
+    assert "journal_entries_updated_total 2" in lines
+    assert "journal_entry_words 812" in lines
+    assert "# TYPE journal_stage_duration_seconds histogram" in lines
+    assert 'journal_stage_duration_seconds_bucket{stage="entry",le="0.001"} 0' in lines
+    assert 'journal_stage_duration_seconds_bucket{stage="entry",le="0.005"} 1' in lines
+    assert 'journal_stage_duration_seconds_bucket{stage="entry",le="0.5"} 2' in lines
+    assert 'journal_stage_duration_seconds_bucket{stage="entry",le="+Inf"} 2' in lines
+    assert 'journal_stage_duration_seconds_count{stage="entry"} 2' in lines
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
+
+
+def test_cache_hits_are_reported_once(tmp_path):
+    """Test that registered caches report only the lookups since the last write"""
+    cache = LRUCache(2)
+    metrics.register_cache("test", cache)
+    cache.get_or_create("a", lambda: 1)
+    cache.get_or_create("a", lambda: 1)
+    run_once(tmp_path, 0.01)
+    text = run_once(tmp_path, 0.01)
+    assert 'journal_cache_hits_total{cache="test"} 1' in text.splitlines()
+    assert 'journal_cache_misses_total{cache="test"} 1' in text.splitlines()
+
+
+def test_concurrent_updates_are_counted(tmp_path):
+    """Test that counters and histograms updated from many threads lose nothing"""
+
+    def work():
+        for _ in range(1000):
+            metrics.increment("entries_updated_total")
+            metrics.observe("stage_duration_seconds", 0.002, stage="entry")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    textfile = tmp_path / "journal.prom"
+    metrics.write_metrics(str(textfile), str(tmp_path / "metrics.json"))
+    lines = textfile.read_text(encoding="utf-8").splitlines()
+    assert "journal_entries_updated_total 8000" in lines
+    assert 'journal_stage_duration_seconds_count{stage="entry"} 8000' in lines
@@ -0,0 +1,79 @@
+import json
+import time
+import threading
+import pytest  # pylint: disable=W0611,E0401
+from config.state import initialize_state
+
+pytest.importorskip("netifaces")
+pytest.importorskip("requests")
+from utils import network  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    """Location cache in a temporary reference directory, on a fixed network"""
+    initialize_state(
+        {"test": True},
+        platform_settings={"path": str(tmp_path), "editor_subprocess": []},
+        reference_dir=str(tmp_path),
+    )
+    monkeypatch.setattr(network, "network_fingerprint", lambda: "10.0.0.2_none")
+    return tmp_path / "network_cache.json"
+
+
+def save(cache_path, updated):
+    """Cache a location for the fixed network"""
+    location = {"latitude": 45.5, "longitude": -122.7, "zipcode": "97201"}
+    cache_path.write_text(
+        json.dumps({"10.0.0.2_none": {**location, "updated": updated}}),
+        encoding="utf-8",
+    )
+
+
+def test_fresh_location_is_not_looked_up(cache_path, monkeypatch):
+    """Test that a location within the TTL comes from the cache"""
+    save(cache_path, time.time())
+    monkeypatch.setattr(network, "get_lat_lon_from_zip", pytest.fail)
+    assert network.get_location() == (45.5, -122.7)
+
+
+def test_stale_location_is_refreshed(cache_path, monkeypatch):
+    """Test that a location past the TTL is looked up again by ZIP code"""
+    save(cache_path, 0.0)
+    monkeypatch.setattr(
+        network,
+        "get_lat_lon_from_zip",
+        lambda zipcode: {"zipcode": zipcode, "latitude": 45.6, "longitude": -122.6},
+    )
+    assert network.get_location() == (45.6, -122.6)
+    saved = json.loads(cache_path.read_text(encoding="utf-8"))["10.0.0.2_none"]
+    assert saved["latitude"] == 45.6 and network.NetworkLocation.from_dict(saved).is_fresh()
+
+
+def test_slow_refresh_stays_within_budget(cache_path, monkeypatch, capsys):
+    """Test that a slow lookup falls back to the stale location within the budget"""
+    save(cache_path, 0.0)
+    release = threading.Event()
+
+    def slow_lookup(zipcode):
+        release.wait(5)
+        raise ValueError(zipcode)
+
+    monkeypatch.setattr(network, "get_lat_lon_from_zip", slow_lookup)
+    started = time.perf_counter()
+    try:
+        assert network.get_location(budget_ms=50) == (45.5, -122.7)
+    finally:
+        release.set()
+    assert time.perf_counter() - started < 0.5
+    # The failed refresh still finishes before the command exits
+    network.finish_refreshes(timeout=1)
+    assert "could not refresh location: 97201" in capsys.readouterr().out
+
+
+def test_http_session_is_reused():
+    """Test that lookups share one session that retries with backoff"""
+    session = network.get_http_session()
+    assert network.get_http_session() is session
+    retries = session.get_adapter("https://example.com").max_retries
+    assert retries.total > 0 and retries.backoff_factor > 0
@@ -0,0 +1,72 @@
+import os
+import time
+import random
+import pytest  # pylint: disable=W0611,E0401
+from utils import snapshots
+from utils.snapshots import SnapshotStore, split_chunks
+
+
+def words(count, seed):
+    """Reproducible text of count words"""
+    rng = random.Random(seed)
+    vocabulary = ["morning", "pages", "stoic", "quiet", "rain"]
+    return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+
+def chunk_bytes(store):
+    """Bytes of all stored chunk files"""
+    return sum(
+        entry.stat().st_size
+        for prefix in os.scandir(store.chunk_dir)
+        for entry in os.scandir(prefix.path)
+    )
+
+
+def test_chunk_boundaries_survive_appends():
+    """Test that appending text leaves all but the last chunk unchanged"""
+    text = words(3000, 1).encode("utf-8")
+    before = split_chunks(text)
+    after = split_chunks(text + b"\n\n#EveningPages, started at 2100\n")
+    assert len(before) > 3
+    assert b"".join(before) == text
+    assert after[: len(before) - 1] == before[:-1]
+
+
+def test_appends_store_only_new_bytes(tmp_path):
+    """Test that versions of a growing entry share chunks and restore exactly"""
+    store = SnapshotStore(str(tmp_path))
+    content = words(3000, 2)
+    store.record("entry.txt", content)
+    first_size = chunk_bytes(store)
+    versions = [content]
+    for i in range(20):
+        content += "\n" + words(40, i + 10)
+        store.record("entry.txt", content)
+        versions.append(content)
+    assert store.record("entry.txt", content) is None
+    assert len(store.versions("entry.txt")) == 21
+    assert chunk_bytes(store) < first_size * 3
+    assert store.restore("entry.txt", 0) == versions[0]
+    assert store.restore("entry.txt") == versions[-1]
+    assert "+" + words(40, 29) in store.diff("entry.txt")
+
+
+def test_prune_applies_retention(tmp_path, monkeypatch):
+    """Test that pruning keeps recent versions and the newest, and sweeps chunks"""
+    store = SnapshotStore(str(tmp_path))
+    now = time.time()
+    for i, age_days in enumerate([400, 300, 10, 5, 1]):
+        monkeypatch.setattr(snapshots.time, "time", lambda: now - age_days * 86400)
+        store.record("entry.txt", words(500, i))
+    monkeypatch.setattr(snapshots.time, "time", lambda: now)
+    monkeypatch.setattr(snapshots, "SWEEP_GRACE_SECONDS", -1)
+
+    assert store.prune(keep_versions=2, keep_days=30) == 3
+    assert store.restore("entry.txt", 0) == words(500, 3)
+    assert store.restore("entry.txt", 1) == words(500, 4)
+    referenced = {c for v in store.versions("entry.txt") for c in v["chunks"]}
+    stored = {e.name for p in os.scandir(store.chunk_dir) for e in os.scandir(p.path)}
+    assert stored == referenced
+
+    assert store.prune(keep_versions=1, keep_days=0) == 1
+    assert store.restore("entry.txt") == words(500, 4)
@@ -0,0 +1,99 @@
+import os
+import threading
+import pytest  # pylint: disable=W0611,E0401
+from utils import staging
+
+
+def write(directory, name, text, mtime):
+    """Write a file with a fixed mtime"""
+    file_path = directory / name
+    file_path.write_text(text, encoding="utf-8")
+    os.utime(file_path, (mtime, mtime))
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    """Local staging and synced directories"""
+    local, synced = tmp_path / "local", tmp_path / "synced"
+    local.mkdir()
+    synced.mkdir()
+    return local, synced
+
+
+def test_reconcile_newer_copy_wins(dirs):
+    """Test that startup reconciliation keeps the newer copy on both sides"""
+    local, synced = dirs
+    cases = [
+        # local, synced, expected updated side, expected text
+        (("old", 100), ("new", 200), "local", "new"),
+        (("new", 300), ("old", 200), "synced", "new"),
+        (("same", 100), ("same", 200), None, "same"),
+        (None, ("remote", 100), "local", "remote"),
+        (("local", 100), None, "synced", "local"),
+    ]
+    for i, (local_copy, synced_copy, updated, text) in enumerate(cases):
+        name = f"{i}.txt"
+        if local_copy:
+            write(local, name, *local_copy)
+        if synced_copy:
+            write(synced, name, *synced_copy)
+        assert staging.reconcile(name, str(local), str(synced)) == updated
+        assert (local / name).read_text(encoding="utf-8") == text
+        assert (synced / name).read_text(encoding="utf-8") == text
+
+
+def test_flush_copies_only_changed_files(dirs):
+    """Test that flushing copies files whose checksum changed since the last flush"""
+    local, synced = dirs
+    write(local, "a.txt", "first", 100)
+    write(local, "b.txt", "other", 100)
+    assert staging.flush_once(str(local), str(synced)) == 2
+    assert staging.flush_once(str(local), str(synced)) == 0
+
+    write(local, "a.txt", "first, edited", 200)
+    assert staging.flush_once(str(local), str(synced)) == 1
+    assert (synced / "a.txt").read_text(encoding="utf-8") == "first, edited"
+    assert (synced / "a.txt").stat().st_mtime == 200
+    assert sorted(p.name for p in synced.iterdir()) == ["a.txt", "b.txt"]
+
+
+def test_flush_keeps_newer_remote_edit(dirs):
+    """Test that a file changed on both sides keeps the newer copy"""
+    local, synced = dirs
+    write(local, "a.txt", "first", 100)
+    staging.flush_once(str(local), str(synced))
+
+    write(local, "a.txt", "local edit", 200)
+    write(synced, "a.txt", "edit on another device", 300)
+    staging.flush_once(str(local), str(synced))
+    assert (local / "a.txt").read_text(encoding="utf-8") == "edit on another device"
+    assert staging.flush_once(str(local), str(synced)) == 0
+
+
+def test_concurrent_manifest_updates_are_kept(dirs):
+    """Test that a flush and reconciliations running together record every file"""
+    local, synced = dirs
+    names = [f"{i}.txt" for i in range(40)]
+    for name in names[::2]:
+        write(local, name, f"local {name}", 100)
+    for name in names[1::2]:
+        write(synced, name, f"synced {name}", 100)
+
+    threads = [
+        threading.Thread(target=staging.flush_once, args=(str(local), str(synced)))
+    ]
+    threads += [
+        threading.Thread(
+            target=lambda part: [
+                staging.reconcile(name, str(local), str(synced)) for name in part
+            ],
+            args=(names[1 + i :: 8],),
+        )
+        for i in range(0, 8, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(staging.load_manifest(str(local))) == sorted(names)
+    assert staging.flush_once(str(local), str(synced)) == 0
@@ -0,0 +1,73 @@
+import io
+import json
+import pytest  # pylint: disable=W0611,E0401
+from writer.export import (
+    parse_entry_text,
+    parse_entries,
+    scan_entries,
+    add_word_counts,
+    write_jsonl,
+    write_markdown,
+    write_html,
+)
+
+ENTRY = (
+    "20250105 Sunday the 5th of January\n"
+    "#MorningPages, started at 0712\n"
+    "Slept well.\n\nWrote a lot.\n\n"
+    "Goal WC: 770\n"
+    "Tarot: 7 of Cups, Debauch\n\n"
+    "#EveningPages, started at 2105\n\n\nQuiet evening, <really>\n"
+    "Goal WC: 1530\n\n"
+    "- Daily Stoic Prompt, 1/05:\n"
+    "5: What is in my control?\n"
+    "\t- Morning:\n\t\t- My attention\n"
+    "\t- Evening:\n\t\t- \n"
+)
+
+
+def test_parse_entry_sections():
+    """Test that an entry splits into morning, evening, tarot and stoic sections"""
+    entry = parse_entry_text(ENTRY)
+    assert entry["title"] == "20250105 Sunday the 5th of January"
+    assert entry["date"] == "2025-01-05"
+    assert entry["started_at"] == {"morning": "0712", "evening": "2105"}
+    assert entry["morning"] == "Slept well.\n\nWrote a lot."
+    assert entry["evening"] == "Quiet evening, <really>"
+    assert entry["tarot"] == "7 of Cups, Debauch"
+    assert entry["stoic"] == [
+        {
+            "date": "1/05",
+            "question": "5: What is in my control?",
+            "morning": "My attention",
+            "evening": "",
+        }
+    ]
+
+
+def test_export_formats(tmp_path):
+    """Test that entries stream in date order into each export format"""
+    for day in (3, 1, 2):
+        title = f"2025010{day} Day the {day}th of January"
+        (tmp_path / f"{title}.txt").write_text(
+            ENTRY.replace("20250105 Sunday the 5th of January", title), encoding="utf-8"
+        )
+    (tmp_path / "notes.txt").write_text("not an entry", encoding="utf-8")
+
+    for workers in (1, 2):
+        out = io.StringIO()
+        entries = add_word_counts(parse_entries(scan_entries(str(tmp_path)), workers))
+        assert write_jsonl(entries, out) == 3
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [row["date"] for row in rows] == ["2025-01-01", "2025-01-02", "2025-01-03"]
+        assert rows[0]["words"] == {"morning": 5, "evening": 3}
+
+    out = io.StringIO()
+    write_markdown(parse_entries(scan_entries(str(tmp_path))), out)
+    assert out.getvalue().count("# 2025010") == 3
+    assert "## Daily Stoic Prompt, 1/05" in out.getvalue()
+
+    out = io.StringIO()
+    write_html(parse_entries(scan_entries(str(tmp_path))), out)
+    assert out.getvalue().count("<article") == 3
+    assert "&lt;really&gt;" in out.getvalue()
@@ -0,0 +1,172 @@
+import json
+from collections import Counter
+from datetime import datetime
+import stat
+import pytest  # pylint: disable=W0611,E0401
+from utils.snapshots import SnapshotStore
+from writer import importer
+from writer.export import parse_entry
+
+EXPORT = {
+    "metadata": {"version": "1.0"},
+    "entries": [
+        {"creationDate": "2024-03-01T07:15:00", "text": "Slept well."},
+        {"creationDate": "2024-03-01T21:40:00", "text": "Long day."},
+        {"creationDate": "2024-03-02T01:05:00", "text": "Still up."},
+        {"creationDate": "2024-03-02T08:00:00", "text": "Rain."},
+        {"creationDate": "2024-03-03", "text": "No time given."},
+        {"creationDate": "2024-03-04T08:00:00", "text": ""},
+    ],
+}
+TITLES = [
+    "20240301 Friday the 1st of March.txt",
+    "20240302 Saturday the 2nd of March.txt",
+    "20240303 Sunday the 3rd of March.txt",
+]
+
+
+def test_json_export_maps_to_entries(tmp_path):
+    """Test that items land in the right entry and section"""
+    source = tmp_path / "export.json"
+    source.write_text(json.dumps(EXPORT, indent=2), encoding="utf-8")
+    journal = tmp_path / "journal"
+    journal.mkdir()
+    checkpoint = tmp_path / "checkpoint.json"
+
+    stats = importer.import_journal(str(source), str(journal), str(checkpoint))
+    assert sorted(p.name for p in journal.iterdir()) == TITLES
+    assert (stats["written"], stats["invalid"]) == (3, 1)
+    assert not checkpoint.exists()
+    # Entries get the same mode as any new file, not the temp file's 0600
+    checkpoint.write_text("", encoding="utf-8")
+    mode = stat.S_IMODE(checkpoint.stat().st_mode)
+    assert stat.S_IMODE((journal / TITLES[0]).stat().st_mode) == mode
+
+    first = parse_entry(str(journal / TITLES[0]))
+    assert first["started_at"] == {"morning": "0715", "evening": "2140"}
+    assert first["morning"] == "Slept well."
+    assert first["evening"] == "Long day.\n\nStill up."
+    assert parse_entry(str(journal / TITLES[2]))["morning"] == "No time given."
+
+    # Importing again changes nothing
+    again = importer.import_journal(str(source), str(journal), str(checkpoint))
+    assert (again["written"], again["unchanged"]) == (0, 3)
+
+
+def test_json_array_is_streamed_in_small_chunks(tmp_path):
+    """Test that items split across read chunks decode whole"""
+    source = tmp_path / "export.json"
+    source.write_text(json.dumps(EXPORT), encoding="utf-8")
+    items = list(importer.read_json_items(str(source), chunk_size=7))
+    assert [item["text"] for item in items] == [
+        entry["text"] for entry in EXPORT["entries"]
+    ]
+
+
+def test_import_resumes_from_checkpoint(tmp_path):
+    """Test that entries recorded in the checkpoint are not written again"""
+    source = tmp_path / "export.jsonl"
+    source.write_text(
+        "\n".join(json.dumps(entry) for entry in EXPORT["entries"]), encoding="utf-8"
+    )
+    journal = tmp_path / "journal"
+    journal.mkdir()
+    checkpoint = tmp_path / "checkpoint.json"
+    importer.save_checkpoint(str(checkpoint), str(source), 2)
+
+    stats = importer.import_journal(str(source), str(journal), str(checkpoint))
+    assert (stats["resumed"], stats["written"]) == (2, 1)
+    assert [p.name for p in journal.iterdir()] == TITLES[2:]
+
+
+def test_markdown_export(tmp_path):
+    """Test that Markdown entries start at each dated heading"""
+    source = tmp_path / "export.md"
+    source.write_text(
+        "# Journal\n\n## 2024-03-01 07:15\n\nSlept well.\n\n---\n\n"
+        "## Friday, 2024-03-01 21:40\n\nLong day.\n",
+        encoding="utf-8",
+    )
+    items = list(importer.read_markdown_items(str(source)))
+    assert [(item["moment"].hour, item["text"]) for item in items] == [
+        (7, "Slept well."),
+        (21, "Long day."),
+    ]
+
+
+def test_dates_in_other_forms(tmp_path):
+    """Test one-digit hours and millisecond timestamps, and bad dates as invalid"""
+    moment = datetime(2024, 3, 1, 7, 15)
+    for value in ("2024-03-01 7:15", moment.timestamp() * 1000, moment.timestamp()):
+        assert importer.parse_moment(value) == (moment, True), value
+    for value in (True, 10**30, float("nan"), "yesterday"):
+        assert importer.parse_moment(value) == (None, False), value
+
+    source = tmp_path / "export.md"
+    source.write_text(
+        "## 2024-03-01 7:15\n\nSlept well.\n\n## 2024-03-02 9:00\n\nRain.\n",
+        encoding="utf-8",
+    )
+    journal = tmp_path / "journal"
+    journal.mkdir()
+    stats = importer.import_journal(
+        str(source), str(journal), str(tmp_path / "checkpoint.json")
+    )
+    assert (stats["written"], stats["invalid"]) == (2, 0)
+    started_at = parse_entry(str(journal / TITLES[0]))["started_at"]
+    assert started_at == {"morning": "0715"}
+
+
+def test_out_of_order_export_merges_days(tmp_path):
+    """Test that items of a day are merged wherever they are, keeping existing text"""
+    entries = [
+        {"creationDate": "2024-03-02T08:00:00", "text": "Rain."},
+        {"creationDate": "2024-03-01T21:40:00", "text": "Long day."},
+        {"creationDate": "2024-03-02T07:00:00", "text": "Up early."},
+        {"creationDate": "2024-03-01T07:15:00", "text": "Slept well."},
+        {"creationDate": "2024-03-02T22:00:00", "text": "Early night."},
+    ]
+    source = tmp_path / "export.jsonl"
+    source.write_text("\n".join(json.dumps(e) for e in entries), encoding="utf-8")
+    journal = tmp_path / "journal"
+    journal.mkdir()
+    (journal / TITLES[0]).write_text(
+        f"{TITLES[0][:-4]}\n#MorningPages, started at 0600\n\nWritten here.\n",
+        encoding="utf-8",
+    )
+
+    history = SnapshotStore(str(tmp_path / "history"))
+    stats = importer.import_journal(
+        str(source),
+        str(journal),
+        str(tmp_path / "checkpoint.json"),
+        workers=8,
+        history=history,
+    )
+    assert (stats["written"], stats["appended"]) == (1, 4)
+    # The entry as it was before the import can be restored
+    versions = history.versions(TITLES[0])
+    assert "Slept well." not in history.restore(TITLES[0], 0)
+    assert history.restore(TITLES[0]) == (journal / TITLES[0]).read_text(
+        encoding="utf-8"
+    )
+    assert len(versions) == 3
+    second = parse_entry(str(journal / TITLES[1]))
+    # Items of a day seen again go at the end of their sections
+    assert second["started_at"] == {"morning": "0800", "evening": "2200"}
+    assert second["morning"] == "Rain.\n\nUp early."
+    first = parse_entry(str(journal / TITLES[0]))
+    assert first["started_at"] == {"morning": "0600", "evening": "2140"}
+    assert first["morning"] == "Written here.\n\nSlept well."
+    assert first["evening"] == "Long day."
+
+    again = importer.import_journal(
+        str(source), str(journal), str(tmp_path / "checkpoint.json")
+    )
+    assert (again["written"], again["appended"], again["unchanged"]) == (0, 0, 5)
+
+    # Days are yielded as the export is read, not after all of it
+    items = (importer.item_from_json(entry) for entry in entries)
+    title, _ = next(importer.group_entries(items, Counter()))
+    assert title == TITLES[1][:-4]
+    assert len(list(items)) == 3
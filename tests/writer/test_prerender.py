@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+import pytest  # pylint: disable=W0611,E0401
+from config.settings import PRERENDER_FILE
+from config.state import initialize_state
+from main import parse_arguments
+from tools.simulate import prepare_reference_dir
+from writer.entry import create_morning_content, prerender_next_morning
+from writer.prerender import PRERENDER_TIMESTAMP, take_prerendered_content
+
+
+@pytest.fixture
+def start_run(tmp_path):
+    """Start a run with stoic prompts at a given time against temporary files"""
+    prepare_reference_dir(str(tmp_path))
+
+    def start(now, *flags):
+        args = parse_arguments(["-s", *flags])
+        initialize_state(
+            args,
+            now=now,
+            platform_settings={"path": str(tmp_path), "editor_subprocess": []},
+            reference_dir=str(tmp_path),
+        )
+
+    return start
+
+
+def test_prerendered_content_is_used_next_morning(start_run, tmp_path):
+    """Test that the morning run takes the pre-rendered content and fills in the time"""
+    start_run(datetime(2025, 3, 1, 20, 0))
+    prerender_next_morning()
+    prerendered = json.loads((tmp_path / PRERENDER_FILE).read_text(encoding="utf-8"))
+    assert prerendered["title"].startswith("20250302")
+    assert PRERENDER_TIMESTAMP in prerendered["content"]
+
+    start_run(datetime(2025, 3, 2, 7, 30))
+    content = create_morning_content()
+    assert content == prerendered["content"].replace(PRERENDER_TIMESTAMP, "0730")
+    assert not (tmp_path / PRERENDER_FILE).exists()
+    progress_file = tmp_path / "stoic_progress.json"
+    progress = json.loads(progress_file.read_text(encoding="utf-8"))
+    assert progress == {**prerendered["stoic_progress"], "updated_on": "2025-03-02"}
+
+
+def test_stale_or_missing_content_is_not_used(start_run, tmp_path):
+    """Test that content for an earlier day is discarded and rendering falls back"""
+    start_run(datetime(2025, 3, 1, 20, 0))
+    assert take_prerendered_content("20250302 Sunday the 2nd of March") is None
+    prerender_next_morning()
+
+    start_run(datetime(2025, 3, 3, 7, 30))
+    content = create_morning_content()
+    assert content.startswith("20250303") and "0730" in content
+    assert PRERENDER_TIMESTAMP not in content
+    assert not (tmp_path / PRERENDER_FILE).exists()
+
+
+def test_content_for_other_arguments_is_not_used(start_run, tmp_path):
+    """Test that content rendered with different arguments is discarded"""
+    start_run(datetime(2025, 3, 1, 20, 0))
+    prerender_next_morning()
+
+    start_run(datetime(2025, 3, 2, 7, 30), "-t")
+    assert take_prerendered_content("20250302 Sunday the 2nd of March") is None
+    assert not (tmp_path / PRERENDER_FILE).exists()
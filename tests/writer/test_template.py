@@ -0,0 +1,77 @@
+import os
+import pytest  # pylint: disable=W0611,E0401
+from config.state import initialize_state
+from writer.template import DEFAULT_TEMPLATE, compile_templates, get_template
+from writer.wordcount import get_ia_writer_style_wordcount_from_string
+
+VALUES = {
+    "title": "20250105 Sunday the 5th of January",
+    "timestamp": "0712",
+    "tarot": "Tarot: 7 of Cups, Debauch, Netzach (Victory)\n\n",
+    "questions": "- What do you want to do today?\n- Rate it, 1-10: \n",
+    "stoic": "\n- Daily Stoic Prompt, 1/05:\n5: Quick brown dogs.\n"
+    "\t- Morning:\n\t\t- \n\t- Evening:\n\t\t- \n",
+}
+
+
+def test_default_morning_matches_fixed_template():
+    """Test that the default morning template renders like the fixed template did"""
+    expected = f"{VALUES['title']}\n#MorningPages, started at {VALUES['timestamp']}\n"
+    expected += "\n\n\nGoal WC: MORNINGWORDCOUNT\n"
+    expected += VALUES["tarot"] + VALUES["questions"] + VALUES["stoic"]
+    goal = get_ia_writer_style_wordcount_from_string(expected) + 750
+    expected = expected.replace("MORNINGWORDCOUNT", str(goal))
+
+    template = compile_templates(DEFAULT_TEMPLATE)["morning"]
+    assert template.render(VALUES, 750) == expected
+
+
+def test_default_evening_matches_fixed_template():
+    """Test that the evening goal no longer needs the + 3 adjustment"""
+    entry_words = 812
+    expected = f"\n#EveningPages, started at {VALUES['timestamp']}\n\n\n\n"
+    goal = get_ia_writer_style_wordcount_from_string(expected) + entry_words + 750 + 3
+    expected += f"Goal WC: {goal}"
+
+    template = compile_templates(DEFAULT_TEMPLATE)["evening"]
+    assert template.render(VALUES, entry_words + 750) == expected
+
+
+def test_custom_template_sections():
+    """Test named sections, literal braces and goals counted from the plan"""
+    templates = compile_templates(
+        "Ignored preamble\n[morning]\n{title} {{draft}}\nGoal: {goal}\n{tarot}"
+    )
+    rendered = templates["morning"].render(VALUES, 750)
+    assert rendered.startswith(VALUES["title"] + " {draft}\nGoal: ")
+    words = get_ia_writer_style_wordcount_from_string(rendered)
+    assert f"Goal: {words + 750}\n" in rendered
+    assert templates["morning"].render({"title": "t"}, 0).endswith("\n")
+
+
+def test_unknown_placeholder():
+    """Test that typos in placeholders are reported when compiling"""
+    for text in ("[morning]\n{titel}", "[morning]\n{goal:>5}", "[morning]\n{}"):
+        with pytest.raises(ValueError):
+            compile_templates(text)
+
+
+def test_template_file_is_cached_by_mtime(tmp_path):
+    """Test that the template file is compiled again only after it changes"""
+    initialize_state(
+        {"test": True},
+        platform_settings={"path": str(tmp_path), "editor_subprocess": []},
+        reference_dir=str(tmp_path),
+    )
+    default = get_template("morning")
+    assert get_template("morning") is default
+
+    template_file = tmp_path / "template.txt"
+    template_file.write_text("[evening]\nEvening {timestamp} {goal}\n", encoding="utf-8")
+    evening = get_template("evening")
+    assert get_template("evening") is evening
+    assert evening.render({"timestamp": "2100"}, 10) == "Evening 2100 13"
+
+    template_file.write_text("[evening]\nLater {goal}\n", encoding="utf-8")
+    os.utime(template_file, ns=(1, 1))
+    assert get_template("evening").render({}, 10) == "Later 12"
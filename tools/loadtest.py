@@ -0,0 +1,126 @@
+"""Load test for the template service
+
+Usage: python -m tools.loadtest [--users N] [--concurrency N] [--requests N] [--url URL]
+
+Without --url, a service is started in-process on a free port with users set
+up in a temporary directory from the example reference files.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import urllib.request
+from urllib.error import HTTPError, URLError
+from concurrent.futures import ThreadPoolExecutor
+from tools.simulate import prepare_reference_dir
+
+CONTENT_QUERY = "tarot=1&questions=1&stoic_prompt=1"
+
+# (weight, method, resource) of each kind of request
+REQUEST_MIX = ((70, "GET", "template"), (20, "GET", "entry"), (10, "POST", "entry"))
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Template service load test")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--url", help="existing service (users must exist)")
+    return parser.parse_args()
+
+
+def request(base_url: str, method: str, user: str, resource: str) -> float:
+    """Make one request and return its latency in seconds"""
+    started = time.perf_counter()
+    req = urllib.request.Request(
+        f"{base_url}/{user}/{resource}?{CONTENT_QUERY}", method=method
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            response.read()
+    except HTTPError as e:
+        # No entry yet is an expected answer
+        if e.code != 404:
+            raise
+    return time.perf_counter() - started
+
+
+def run_load(base_url: str, users: list, concurrency: int, count: int) -> dict:
+    """Send count requests from concurrency workers and summarize them"""
+    weights = [weight for weight, _, _ in REQUEST_MIX]
+    plan = [
+        (random.choice(users), random.choices(REQUEST_MIX, weights)[0])
+        for _ in range(count)
+    ]
+
+    def send(item):
+        user, (_, method, resource) = item
+        try:
+            return request(base_url, method, user, resource)
+        except (HTTPError, URLError, OSError):
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, plan))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency in results if latency is not None)
+    return {
+        "requests": count,
+        "errors": count - len(latencies),
+        "seconds": elapsed,
+        "requests_per_second": count / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def percentile(values: list, pct: int) -> float:
+    """Percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, len(values) * pct // 100)]
+
+
+def main() -> int:
+    """Run the load test from the command line"""
+    # pylint: disable=import-outside-toplevel
+    args = parse_arguments()
+    users = [f"user{n}" for n in range(args.users)]
+
+    if args.url:
+        report = run_load(args.url.rstrip("/"), users, args.concurrency, args.requests)
+    else:
+        from service.app import make_service_server
+
+        with tempfile.TemporaryDirectory(prefix="journal-load-") as root:
+            for user in users:
+                os.makedirs(os.path.join(root, user, "entries"))
+                prepare_reference_dir(os.path.join(root, user, "personal"))
+            server = make_service_server(root, "127.0.0.1", 0, quiet=True)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            try:
+                report = run_load(base_url, users, args.concurrency, args.requests)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    print(
+        f"{report['requests']} requests in {report['seconds']:.2f}s: "
+        f"{report['requests_per_second']:.0f} req/s, "
+        f"p50 {report['p50_ms']:.1f}ms, p95 {report['p95_ms']:.1f}ms, "
+        f"{report['errors']} errors"
+    )
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Replay journal invocations over simulated days against a temporary directory
+
+Usage: python -m tools.simulate [--days N] [--start YYYY-MM-DD] [--skip-every N]
+
+Each simulated day runs a morning, an evening and a late night (1am the next
+day) invocation with the clock pinned to that moment, then checks the entry and
+stoic progress for inconsistent state.
+"""
+
+import os
+import io
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+# (name, hour, day offset) for each invocation of a simulated day
+INVOCATIONS = (("morning", 7, 0), ("evening", 19, 0), ("late night", 1, 1))
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Journal time-travel simulation")
+    parser.add_argument("--days", type=int, default=400, help="days to simulate")
+    parser.add_argument(
+        "--start",
+        default=f"{datetime.now().year - 1}-12-01",
+        help="first simulated day (YYYY-MM-DD), default crosses a Dec 31 rollover",
+    )
+    parser.add_argument(
+        "--skip-every",
+        type=int,
+        default=7,
+        help=(
+            "skip morning and evening every Nth day so the late night run "
+            "creates the entry (0 to disable)"
+        ),
+    )
+    return parser.parse_args()
+
+
+def prepare_reference_dir(reference_dir: str) -> None:
+    """Copy the example reference files into place"""
+    os.makedirs(reference_dir, exist_ok=True)
+    shutil.copy(os.path.join(EXAMPLES_DIR, "stoics.csv"), reference_dir)
+    shutil.copy(os.path.join(EXAMPLES_DIR, "tarot.csv"), reference_dir)
+    shutil.copy(
+        os.path.join(EXAMPLES_DIR, "questions.txt"),
+        os.path.join(reference_dir, "questions-daily.txt"),
+    )
+
+
+def check_entry(entry_file_path: str, evening_done: bool) -> list:
+    """Return a list of problems found in an entry"""
+    problems = []
+    if not os.path.exists(entry_file_path):
+        return [f"missing entry {os.path.basename(entry_file_path)}"]
+    with open(entry_file_path, "r", encoding="utf-8") as file:
+        content = file.read()
+    name = os.path.basename(entry_file_path)
+    mornings = len(re.findall(r"^#MorningPages", content, flags=re.MULTILINE))
+    evenings = len(re.findall(r"^#EveningPages", content, flags=re.MULTILINE))
+    if mornings != 1:
+        problems.append(f"{name}: {mornings} #MorningPages sections")
+    if evenings != (1 if evening_done else 0):
+        problems.append(f"{name}: {evenings} #EveningPages sections")
+    prompts = re.findall(r"^- Daily Stoic Prompt, .*$", content, flags=re.MULTILINE)
+    if len(prompts) != len(set(prompts)):
+        problems.append(f"{name}: duplicate stoic prompts")
+    if len(re.findall(r"^Tarot:", content, flags=re.MULTILINE)) > 1:
+        problems.append(f"{name}: more than one tarot card")
+    return problems
+
+
+def simulate(start: datetime, days: int, skip_every: int, workdir: str) -> dict:
+    """Run the simulation and return a report"""
+    # pylint: disable=import-outside-toplevel
+    from config.settings import STOICS_PROGRESS_FILE
+    from config.state import initialize_state, get_state
+    from main import update_or_create_entry
+    from utils.locking import use_lock_dir
+
+    use_lock_dir(os.path.join(workdir, "locks"))
+    journal_path = os.path.join(workdir, "entries")
+    reference_dir = os.path.join(workdir, "personal")
+    os.makedirs(journal_path, exist_ok=True)
+    prepare_reference_dir(reference_dir)
+    platform_settings = {"path": journal_path, "editor_subprocess": ["true"]}
+    args = {
+        "all": False,
+        "questions": True,
+        "tarot": True,
+        "stoic_prompt": True,
+        "test": False,
+        "do_not_move_stoics": False,
+        "zodiac": False,
+        "no_review": True,
+        "prerender": False,
+    }
+
+    problems = []
+    invocations = 0
+    last_progress_day = 0
+    started = time.perf_counter()
+
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        skipped = skip_every and offset % skip_every == skip_every - 1
+        for name, hour, day_offset in INVOCATIONS:
+            if skipped and name != "late night":
+                continue
+            moment = day.replace(hour=hour) + timedelta(days=day_offset)
+            with redirect_stdout(io.StringIO()):
+                initialize_state(args, moment, platform_settings, reference_dir)
+                update_or_create_entry()
+            invocations += 1
+
+            state = get_state()
+            if state.title_now[:8] != day.strftime("%Y%m%d"):
+                problems.append(f"{moment}: {name} run wrote to {state.title_now}")
+            problems.extend(
+                f"{moment} ({name}): {problem}"
+                for problem in check_entry(
+                    state.entry_file_path, not skipped and name != "morning"
+                )
+            )
+
+        with open(state.reference_file(STOICS_PROGRESS_FILE), encoding="utf-8") as file:
+            progress = json.load(file)
+        if progress["day"] < last_progress_day:
+            problems.append(f"{day:%Y-%m-%d}: stoic progress went backwards")
+        last_progress_day = progress["day"]
+
+    elapsed = time.perf_counter() - started
+    return {
+        "days": days,
+        "invocations": invocations,
+        "seconds": elapsed,
+        "invocations_per_second": invocations / elapsed if elapsed else 0.0,
+        "stoic_progress_day": last_progress_day,
+        "problems": problems,
+    }
+
+
+def main() -> int:
+    """Run the simulation from the command line"""
+    args = parse_arguments()
+    start = datetime.strptime(args.start, "%Y-%m-%d")
+    with tempfile.TemporaryDirectory(prefix="journal-sim-") as workdir:
+        report = simulate(start, args.days, args.skip_every, workdir)
+
+    print(
+        f"Simulated {report['days']} days / {report['invocations']} invocations "
+        f"in {report['seconds']:.2f}s ({report['invocations_per_second']:.0f}/s)"
+    )
+    print(f"Stoic progress ended on day {report['stoic_progress_day']}")
+    for problem in report["problems"][:20]:
+        print(f"  {problem}")
+    if report["problems"]:
+        print(f"{len(report['problems'])} inconsistencies found")
+        return 1
+    print("No inconsistencies found")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
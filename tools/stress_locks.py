@@ -0,0 +1,101 @@
+"""Stress test concurrent entry updates
+
+Usage: python -m tools.stress_locks [--processes N] [--updates N]
+
+Runs updates from N processes at once against one entry in a temporary
+directory, each appending a unique line (every fourth one also moving the
+stoic prompts to the end), then checks that no edit was lost and reports how
+long processes waited for the lock.
+"""
+
+import os
+import io
+import sys
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+ENTRY = (
+    "20250105 Sunday the 5th of January\n"
+    "#MorningPages, started at 0712\n\n\n\nGoal WC: 770\n\n"
+    "- Daily Stoic Prompt, 1/05:\n5: What is in my control?\n"
+    "\t- Morning:\n\t\t- \n\t- Evening:\n\t\t- \n"
+    "\n#EveningPages, started at 2105\n\n\n\nGoal WC: 1530\n"
+)
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Concurrent update stress test")
+    parser.add_argument("--processes", type=int, default=16)
+    parser.add_argument("--updates", type=int, default=400)
+    return parser.parse_args()
+
+
+def update(workdir: str, number: int) -> float:
+    """Append one unique line to the entry, returning its longest lock wait
+
+    The wait is the upper bound of the highest lock_wait_seconds bucket used.
+    """
+    # pylint: disable=import-outside-toplevel
+    from config.state import initialize_state, get_state
+    from utils.metrics import BUCKETS, histogram
+    from writer.entry import update_entry_with_new_content, move_stoics_to_end
+
+    initialize_state(
+        {"test": False},
+        platform_settings={"path": workdir, "editor_subprocess": []},
+        reference_dir=workdir,
+    )
+    state = get_state()
+    state.entry_file_path = os.path.join(workdir, "entry.txt")
+    before = histogram("lock_wait_seconds")["buckets"]
+    with redirect_stdout(io.StringIO()):
+        update_entry_with_new_content(f"- edit {number}\n", "\n")
+        if number % 4 == 0:
+            move_stoics_to_end()
+    after = histogram("lock_wait_seconds")["buckets"]
+    used = [i for i, (old, new) in enumerate(zip(before, after)) if new > old]
+    return (BUCKETS + (float("inf"),))[max(used)] if used else 0.0
+
+
+def stress(workdir: str, processes: int, updates: int) -> dict:
+    """Run the updates and summarize them"""
+    entry_file_path = os.path.join(workdir, "entry.txt")
+    with open(entry_file_path, "w", encoding="utf-8") as file:
+        file.write(ENTRY)
+
+    # pylint: disable=import-outside-toplevel
+    from utils.locking import use_lock_dir
+
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=use_lock_dir,
+        initargs=(os.path.join(workdir, "locks"),),
+    ) as executor:
+        waits = list(
+            executor.map(update, [workdir] * updates, range(updates), chunksize=1)
+        )
+
+    with open(entry_file_path, "r", encoding="utf-8") as file:
+        lines = set(file.read().splitlines())
+    lost = [number for number in range(updates) if f"- edit {number}" not in lines]
+    return {"updates": updates, "lost": lost, "max_wait": max(waits)}
+
+
+def main() -> int:
+    """Run the stress test from the command line"""
+    args = parse_arguments()
+    with tempfile.TemporaryDirectory(prefix="journal-locks-") as workdir:
+        report = stress(workdir, args.processes, args.updates)
+    print(
+        f"{report['updates']} updates from {args.processes} processes: "
+        f"{len(report['lost'])} lost, longest lock wait under "
+        f"{report['max_wait'] * 1000:.1f}ms"
+    )
+    return 1 if report["lost"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""Clock for the journal application, snapshotted once per run"""
+
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+_snapshot: ContextVar[Optional[datetime]] = ContextVar("clock", default=None)
+
+
+def set_now(moment: Optional[datetime] = None) -> datetime:
+    """Snapshot the current time (or pin the clock to moment) for this run"""
+    snapshot = moment or datetime.now()
+    _snapshot.set(snapshot)
+    return snapshot
+
+
+def now() -> datetime:
+    """Get the time of this run, taking the snapshot on first use"""
+    snapshot = _snapshot.get()
+    if snapshot is None:
+        return set_now()
+    return snapshot
@@ -1,14 +1,16 @@
 from datetime import datetime
+from typing import Optional
+from utils import clock
 
 
-def is_first_of_month() -> bool:
-    """Check if today is the first day of the month"""
-    return datetime.now().day == 1
+def is_first_of_month(date: Optional[datetime] = None) -> bool:
+    """Check if today (or the given date) is the first day of the month"""
+    return (date or clock.now()).day == 1
 
 
-def is_sunday() -> bool:
-    """Check if today is Sunday"""
-    return datetime.now().weekday() == 6
+def is_sunday(date: Optional[datetime] = None) -> bool:
+    """Check if today (or the given date) is Sunday"""
+    return (date or clock.now()).weekday() == 6
 
 
 ordinal_strings = {
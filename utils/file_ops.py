@@ -1,7 +1,33 @@
 """File operations module"""
 
+import os
 import re
+import csv
 import subprocess
+from typing import Any, Callable, Optional
+from utils.cache import LRUCache
+
+
+def read_cached(
+    file_path: str, parse: Callable[[str], Any], cache: Optional[LRUCache] = None
+) -> Any:
+    """Parse a file, reusing the cached result while its mtime is unchanged
+
+    Cached results are shared, so callers must not modify them.
+    """
+    if cache is None:
+        return parse(file_path)
+    try:
+        mtime = os.stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        return parse(file_path)
+    return cache.get_or_create((file_path, mtime), lambda: parse(file_path))
+
+
+def read_csv_rows(file_path: str) -> list:
+    """Read a CSV file with a header row into a list of dictionaries"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
 
 
 def read_question_file(file_path: str) -> list:
@@ -37,6 +63,7 @@ def get_content_and_cut_dictionary(file_path, start, end_non_inclusive) -> dict:
     return {"content": "".join(content), "cut": "".join(cut_section)}
 
 
-def open_editor(cmd: list) -> None:
+def open_editor(cmd: list) -> subprocess.Popen:
+    """Launch the editor without waiting for it"""
     print(" ".join(cmd[0:-1]) + f' "{cmd[-1]}"')
-    subprocess.run(cmd, check=False)
+    return subprocess.Popen(cmd)  # pylint: disable=consider-using-with
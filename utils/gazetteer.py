@@ -0,0 +1,152 @@
+"""Offline ZIP code to coordinates lookup
+
+The gazetteer is a compact binary file: a header followed by three arrays of
+the same length, sorted by ZIP code, that are searched with binary search
+straight from a memory map:
+
+    header     magic b"ZIPG", version (uint32), count (uint32)
+    zipcodes   uint32[count]
+    latitudes  float32[count]
+    longitudes float32[count]
+
+Build it from the Census ZCTA gazetteer file (tab separated, with GEOID,
+INTPTLAT and INTPTLONG columns) or any CSV with zipcode, latitude and longitude
+columns:
+
+    python -m utils.gazetteer build 2023_Gaz_zcta_national.txt
+    python -m utils.gazetteer lookup 10001
+"""
+
+import os
+import sys
+import csv
+import mmap
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+from typing import Dict, Optional
+from config.settings import ZIP_GAZETTEER
+
+HEADER = struct.Struct("<4sII")
+MAGIC = b"ZIPG"
+VERSION = 1
+
+# Column names accepted for each field, in order of preference
+ZIP_COLUMNS = ("GEOID", "zipcode", "zip")
+LATITUDE_COLUMNS = ("INTPTLAT", "latitude", "lat")
+LONGITUDE_COLUMNS = ("INTPTLONG", "longitude", "lon")
+
+
+def _column(row: dict, names: tuple) -> str:
+    for name in names:
+        if row.get(name):
+            return row[name]
+    raise KeyError(f"none of the columns {', '.join(names)} found")
+
+
+def build_gazetteer(source_path: str, dest_path: str = ZIP_GAZETTEER) -> int:
+    """Build a gazetteer file from a CSV/TSV source, returning the number of ZIP codes"""
+    rows = {}
+    with open(source_path, "r", encoding="utf-8", newline="") as file:
+        delimiter = "\t" if "\t" in file.readline() else ","
+        file.seek(0)
+        reader = csv.DictReader(file, delimiter=delimiter)
+        for row in reader:
+            row = {key.strip(): value.strip() for key, value in row.items() if key}
+            rows[int(_column(row, ZIP_COLUMNS))] = (
+                float(_column(row, LATITUDE_COLUMNS)),
+                float(_column(row, LONGITUDE_COLUMNS)),
+            )
+
+    zipcodes = array("I", sorted(rows))
+    latitudes = array("f", (rows[zipcode][0] for zipcode in zipcodes))
+    longitudes = array("f", (rows[zipcode][1] for zipcode in zipcodes))
+    if sys.byteorder != "little":
+        for values in (zipcodes, latitudes, longitudes):
+            values.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    with open(dest_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(zipcodes)))
+        for values in (zipcodes, latitudes, longitudes):
+            values.tofile(file)
+    return len(zipcodes)
+
+
+class Gazetteer:
+    """Memory-mapped gazetteer file"""
+
+    def __init__(self, file_path: str = ZIP_GAZETTEER):
+        with open(file_path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a ZIP gazetteer file: {file_path}")
+        self.count = count
+        zipcodes_end = HEADER.size + 4 * count
+        latitudes_end = zipcodes_end + 4 * count
+        if sys.byteorder == "little":
+            data = memoryview(self._map)
+            self._zipcodes = data[HEADER.size : zipcodes_end].cast("I")
+            self._latitudes = data[zipcodes_end:latitudes_end].cast("f")
+            self._longitudes = data[latitudes_end : latitudes_end + 4 * count].cast("f")
+        else:
+            self._zipcodes = array("I", self._map[HEADER.size : zipcodes_end])
+            self._latitudes = array("f", self._map[zipcodes_end:latitudes_end])
+            self._longitudes = array(
+                "f", self._map[latitudes_end : latitudes_end + 4 * count]
+            )
+            for values in (self._zipcodes, self._latitudes, self._longitudes):
+                values.byteswap()
+
+    def lookup(self, zipcode: str) -> Optional[Dict[str, float]]:
+        """Return the coordinates of a ZIP code, or None if it is not known"""
+        # Exactly five ASCII digits: int() would also take "1001" or "０１００１"
+        if len(zipcode) != 5 or not zipcode.isascii() or not zipcode.isdigit():
+            return None
+        key = int(zipcode)
+        index = bisect_left(self._zipcodes, key)
+        if index == self.count or self._zipcodes[index] != key:
+            return None
+        return {
+            "zipcode": zipcode,
+            "latitude": round(self._latitudes[index], 6),
+            "longitude": round(self._longitudes[index], 6),
+        }
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def lookup_zip(zipcode: str) -> Optional[Dict[str, float]]:
+    """Look up a ZIP code in the bundled gazetteer, or None if unavailable"""
+    global _gazetteer  # pylint: disable=global-statement
+    if _gazetteer is None:
+        try:
+            _gazetteer = Gazetteer()
+        except (FileNotFoundError, ValueError):
+            return None
+    return _gazetteer.lookup(zipcode)
+
+
+def main():
+    """Build or query the gazetteer from the command line"""
+    parser = argparse.ArgumentParser(description="Offline ZIP code gazetteer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build the gazetteer from a source file")
+    build.add_argument("source")
+    build.add_argument("dest", nargs="?", default=ZIP_GAZETTEER)
+    lookup = commands.add_parser("lookup", help="look up a ZIP code")
+    lookup.add_argument("zipcode")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_gazetteer(args.source, args.dest)
+        print(f"Wrote {count} ZIP codes to {args.dest}")
+    else:
+        print(lookup_zip(args.zipcode) or f"ZIP code not found: {args.zipcode}")
+
+
+if __name__ == "__main__":
+    main()
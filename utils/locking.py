@@ -0,0 +1,125 @@
+"""Advisory file locking for read-modify-write updates
+
+Writers hold an exclusive fcntl lock on a sidecar file in LOCK_DIR (so nothing
+extra appears in the synced journal folder) only while they read, modify and
+replace a file. Files are replaced atomically, so readers never need the lock.
+The holder removes the sidecar before unlocking, and a writer that locked a
+sidecar removed meanwhile starts over, so no lock files are left behind.
+"""
+
+import os
+import stat
+import time
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional, Union
+from config import settings
+from config.settings import LOCK_TIMEOUT_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+
+LOCK_POLL_SECONDS = 0.002
+
+
+def use_lock_dir(directory: str) -> None:
+    """Keep lock files in directory, as tests and tools do with a temporary one"""
+    settings.LOCK_DIR = directory
+
+
+def lock_path_for(file_path: str) -> str:
+    """Sidecar lock file for a file"""
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+    return os.path.join(settings.LOCK_DIR, f"{digest}.lock")
+
+
+@contextmanager
+def locked(file_path: str, timeout: float = LOCK_TIMEOUT_SECONDS) -> Iterator[float]:
+    """Hold the exclusive lock for file_path, yielding how long it took to get"""
+    # utils.metrics writes its own files with these locks
+    from utils.metrics import observe  # pylint: disable=import-outside-toplevel
+
+    if fcntl is None:
+        yield 0.0
+        return
+    os.makedirs(settings.LOCK_DIR, exist_ok=True)
+    lock_path = lock_path_for(file_path)
+    started = time.perf_counter()
+    while True:
+        lock_file = open(lock_path, "a", encoding="utf-8")  # pylint: disable=R1732
+        try:
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError as e:
+                    if time.perf_counter() - started > timeout:
+                        raise TimeoutError(
+                            f"Timed out waiting for lock on {file_path}"
+                        ) from e
+                    time.sleep(LOCK_POLL_SECONDS)
+            try:
+                current = os.stat(lock_path)
+            except FileNotFoundError:
+                current = None
+        except BaseException:
+            lock_file.close()
+            raise
+        if current and os.path.samestat(current, os.fstat(lock_file.fileno())):
+            break
+        # The previous holder removed this sidecar after it was opened
+        lock_file.close()
+    waited = time.perf_counter() - started
+    observe("lock_wait_seconds", waited)
+    try:
+        yield waited
+    finally:
+        os.remove(lock_path)
+        lock_file.close()
+
+
+@lru_cache(maxsize=None)
+def _umask() -> int:
+    # Reading the umask means setting it, so only do it once
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def file_mode(file_path: str) -> int:
+    """Mode for a file replacing file_path: its own, or the default for a new one"""
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_umask()
+
+
+def atomic_write(
+    file_path: str, content: Union[str, bytes], mtime_ns: Optional[int] = None
+) -> None:
+    """Replace a file's content so readers see either the old or the new version
+
+    The new version is on disk before it replaces the old one. mtime_ns sets
+    its modification time, as when copying a file.
+    """
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    directory, name = os.path.split(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", dir=directory)
+    try:
+        # mkstemp creates the file readable only by its owner
+        os.chmod(temp_path, file_mode(file_path))
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if mtime_ns is not None:
+            os.utime(temp_path, ns=(mtime_ns, mtime_ns))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,179 @@
+"""Run metrics written as a node-exporter textfile
+
+Each run records stage timings, counters and gauges in memory, bucketing each
+timing as it is observed so memory stays bounded however long the process runs
+(as the service does, which never writes the textfile). At the end of the run
+they are merged into the running totals kept in a JSON state file and the
+whole set is written out in the Prometheus text format read by node-exporter's
+textfile collector. Both files are replaced atomically.
+"""
+
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+from utils.cache import LRUCache
+from utils.locking import atomic_write, locked
+
+PREFIX = "journal_"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "stage_duration_seconds": "Time spent in each stage of a run",
+    "lock_wait_seconds": "Time spent waiting for file locks",
+    "runs_total": "Runs of the journal command",
+    "entries_created_total": "Entries created",
+    "entries_updated_total": "Updates written to existing entries",
+    "cache_hits_total": "Cache lookups answered from the cache",
+    "cache_misses_total": "Cache lookups that had to compute the value",
+    "entry_words": "Words in today's entry",
+    "entry_goal_words": "Word count goal of today's entry",
+    "wordcount_goal_words": "Words to write per morning or evening (GLOBAL_WORDCOUNT_GOAL)",
+    "stoic_days_behind": "Days the stoic prompts are behind the calendar",
+    "stoic_days_until_caught_up": "Days until the stoic prompts catch up at the catch-up rate",
+    "last_run_timestamp_seconds": "Time of the last run",
+    "provider_duration_seconds": "Time spent rendering each content provider",
+    "location_lookups_total": "Location lookups by how they were answered",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_counters: Dict[Tuple[str, Labels], float] = {}
+_gauges: Dict[Tuple[str, Labels], float] = {}
+_observations: Dict[Tuple[str, Labels], dict] = {}
+_caches: Dict[str, LRUCache] = {}
+_cache_reported: Dict[str, Tuple[int, int]] = {}
+# Guards the dicts above, which the service updates from its request threads
+_lock = threading.RLock()
+
+
+def _new_histogram() -> dict:
+    return {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment(name: str, amount: float = 1, **labels) -> None:
+    """Add to a counter for this run"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set a gauge to its value at the end of this run"""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Add an observation to a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        series = _observations.get(key)
+        if series is None:
+            series = _observations[key] = _new_histogram()
+        series["buckets"][bisect_left(BUCKETS, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+
+def histogram(name: str, **labels) -> dict:
+    """Buckets, sum and count observed for a series since the last write"""
+    with _lock:
+        series = _observations.get(_key(name, labels)) or _new_histogram()
+        return dict(series, buckets=list(series["buckets"]))
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a stage of the run"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_duration_seconds", time.perf_counter() - started, stage=stage)
+
+
+def register_cache(name: str, cache: LRUCache) -> None:
+    """Report a cache's hits and misses with the run's metrics"""
+    with _lock:
+        _caches[name] = cache
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _label_string(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _merge(totals: dict) -> dict:
+    for name, cache in _caches.items():
+        hits, misses = _cache_reported.get(name, (0, 0))
+        increment("cache_hits_total", cache.hits - hits, cache=name)
+        increment("cache_misses_total", cache.misses - misses, cache=name)
+        _cache_reported[name] = (cache.hits, cache.misses)
+    for (name, labels), value in _counters.items():
+        series = totals["counter"].setdefault(name, {})
+        series[_label_string(labels)] = series.get(_label_string(labels), 0) + value
+    for (name, labels), value in _gauges.items():
+        totals["gauge"].setdefault(name, {})[_label_string(labels)] = value
+    for (name, labels), observed in _observations.items():
+        total = totals["histogram"].setdefault(name, {}).setdefault(
+            _label_string(labels), _new_histogram()
+        )
+        for index, count in enumerate(observed["buckets"]):
+            total["buckets"][index] += count
+        total["sum"] += observed["sum"]
+        total["count"] += observed["count"]
+    return totals
+
+
+def render(totals: dict) -> str:
+    """Render running totals in the Prometheus text format"""
+    lines = []
+    for metric_type in ("counter", "gauge"):
+        for name, series in sorted(totals[metric_type].items()):
+            lines.append(f"# HELP {PREFIX}{name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{PREFIX}{name}{labels} {_format_value(value)}")
+    for name, series in sorted(totals["histogram"].items()):
+        lines.append(f"# HELP {PREFIX}{name} {METRIC_HELP.get(name, name)}")
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for labels, histogram in sorted(series.items()):
+            inner = labels[1:-1] + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{PREFIX}{name}_bucket{{{inner}le="{bound}"}} {cumulative}')
+            lines.append(f"{PREFIX}{name}_sum{labels} {_format_value(histogram['sum'])}")
+            lines.append(f"{PREFIX}{name}_count{labels} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(textfile_path: str, state_path: str) -> None:
+    """Merge this run into the running totals and write the textfile"""
+    set_gauge("last_run_timestamp_seconds", time.time())
+    increment("runs_total")
+    with _lock, locked(state_path):
+        try:
+            with open(state_path, "r", encoding="utf-8") as file:
+                totals = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            totals = {"counter": {}, "gauge": {}, "histogram": {}}
+        totals = _merge(totals)
+        atomic_write(state_path, json.dumps(totals))
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
+    atomic_write(textfile_path, render(totals))
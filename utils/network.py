@@ -1,17 +1,44 @@
 """Network utilities module"""
 
+import os
 import time
+import atexit
 import json
-from pathlib import Path
-from typing import Optional, Tuple, Dict
+import threading
+from typing import Any, List, Optional, Tuple, Dict
 import netifaces
 import requests
-
-
-def debug_print(msg: str, start_time: float):
-    """Print debug timing information."""
-    # TODO: Implement debug printing command line option
-    # print(f"{msg}: {time.time() - start_time:.2f}s")
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config.settings import (
+    ZIP_LOOKUP_URL,
+    NETWORK_CACHE_FILE,
+    NETWORK_CACHE_TTL_SECONDS,
+    NETWORK_FINGERPRINT_TTL_SECONDS,
+    LOCATION_BUDGET_MS,
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_RETRIES,
+    HTTP_BACKOFF_SECONDS,
+)
+from config.state import get_state
+from utils.cache import LRUCache
+from utils.file_ops import read_cached
+from utils.gazetteer import lookup_zip
+from utils.locking import locked, atomic_write
+from utils.metrics import increment, register_cache
+
+# Where the cache was kept before it moved to the reference directory
+LEGACY_NETWORK_CACHE = "network_cache.json"
+
+# Parsed location cache, keyed by path and mtime
+_location_cache = LRUCache(4)
+register_cache("locations", _location_cache)
+# (time.monotonic() of the last check, network key)
+_fingerprint: Tuple[Optional[float], Optional[str]] = (None, None)
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+# Lookups still running when get_location returned
+_refreshes: List[threading.Thread] = []
 
 
 def get_network_addresses() -> Tuple[Optional[str], Optional[str]]:
@@ -56,12 +83,18 @@ class NetworkLocation:
         latitude: Optional[float] = None,
         longitude: Optional[float] = None,
         zipcode: Optional[str] = None,
+        updated: float = 0.0,
     ):
         self.ipv4 = ipv4
         self.ipv6 = ipv6
         self.latitude = latitude
         self.longitude = longitude
         self.zipcode = zipcode
+        self.updated = updated
+
+    def is_fresh(self, ttl_seconds: float = NETWORK_CACHE_TTL_SECONDS) -> bool:
+        """Whether the coordinates were looked up within the TTL"""
+        return time.time() - self.updated < ttl_seconds
 
     def to_dict(self) -> dict:
         """Convert object to dictionary."""
@@ -71,6 +104,7 @@ class NetworkLocation:
             "latitude": self.latitude,
             "longitude": self.longitude,
             "zipcode": self.zipcode,
+            "updated": self.updated,
         }
 
     @classmethod
@@ -82,29 +116,71 @@ class NetworkLocation:
             latitude=data.get("latitude"),
             longitude=data.get("longitude"),
             zipcode=data.get("zipcode"),
+            updated=data.get("updated", 0.0),
         )
 
 
-def load_network_cache() -> Dict[str, NetworkLocation]:
-    """Load saved network location data from JSON file."""
-    cache_path = Path("network_cache.json")
-    if cache_path.exists():
-        with open(cache_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return {k: NetworkLocation.from_dict(v) for k, v in data.items()}
+def network_cache_path() -> str:
+    """Location cache in the reference directory"""
+    return get_state().reference_file(NETWORK_CACHE_FILE)
+
+
+def load_network_cache(cache_path: str) -> Dict[str, NetworkLocation]:
+    """Load saved network location data from JSON file (or the old one in the CWD)."""
+    for file_path in (cache_path, LEGACY_NETWORK_CACHE):
+        if os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                return {k: NetworkLocation.from_dict(v) for k, v in data.items()}
     return {}
 
 
-def save_network_cache(cache: Dict[str, NetworkLocation]) -> None:
-    """Save network location data to JSON file."""
-    with open("network_cache.json", "w", encoding="utf-8") as f:
-        json.dump({k: v.to_dict() for k, v in cache.items()}, f, indent=2)
+def save_network_location(
+    cache_path: str, network_key: str, location: NetworkLocation
+) -> None:
+    """Add or replace one network's location in the JSON file."""
+    with locked(cache_path):
+        cache = load_network_cache(cache_path)
+        cache[network_key] = location
+        atomic_write(
+            cache_path,
+            json.dumps({k: v.to_dict() for k, v in cache.items()}, indent=2),
+        )
 
 
-def get_lat_lon_from_zip(zipcode: str) -> Dict[str, float]:
-    """Convert ZIP code to latitude/longitude using public API."""
+def get_http_session() -> requests.Session:
+    """Shared HTTP session, pooling connections and retrying failures with backoff"""
+    global _http_session  # pylint: disable=global-statement
+    with _http_session_lock:
+        if _http_session is None:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_BACKOFF_SECONDS,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+            )
+            adapter = HTTPAdapter(max_retries=retry)
+            _http_session = requests.Session()
+            _http_session.mount("http://", adapter)
+            _http_session.mount("https://", adapter)
+    return _http_session
+
+
+def get_lat_lon_from_zip(
+    zipcode: str,
+    lookup_url: Optional[str] = ZIP_LOOKUP_URL,
+    timeout: float = HTTP_TIMEOUT_SECONDS,
+) -> Dict[str, float]:
+    """Convert ZIP code to latitude/longitude, offline if possible, else via lookup_url"""
+    location = lookup_zip(zipcode)
+    if location:
+        return location
+    if not lookup_url:
+        raise ValueError(f"ZIP code not found: {zipcode}")
     try:
-        response = requests.get(f"https://api.zippopotam.us/us/{zipcode}", timeout=5)
+        response = get_http_session().get(
+            lookup_url.format(zipcode=zipcode), timeout=timeout
+        )
         if response.status_code == 404:
             raise ValueError(f"ZIP code not found: {zipcode}")
         response.raise_for_status()
@@ -124,48 +200,121 @@ def create_network_key(ipv4: Optional[str], ipv6: Optional[str]) -> str:
     return f"{ipv4 or 'none'}_{ipv6 or 'none'}"
 
 
-def get_location() -> Tuple[float, float]:
-    """Get location based on network IPs and saved/input location data."""
-    start_time = time.time()
-
-    try:
+def network_fingerprint() -> Optional[str]:
+    """Key for the current network, rechecked every NETWORK_FINGERPRINT_TTL_SECONDS"""
+    global _fingerprint  # pylint: disable=global-statement
+    checked, network_key = _fingerprint
+    if checked is None or time.monotonic() - checked > NETWORK_FINGERPRINT_TTL_SECONDS:
         ipv4, ipv6 = get_network_addresses()
-        debug_print("Network detection", start_time)
-
-        if not ipv4 and not ipv6:
-            raise ValueError("Location information unavailable: no network detected")
-
-        network_key = create_network_key(ipv4, ipv6)
-        network_cache = load_network_cache()
-        debug_print("Load cache", start_time)
-
-        if network_key not in network_cache:
-            print(f"Network not found in cache (IPv4: {ipv4}, IPv6: {ipv6})")
-            try:
-                zipcode = input("Enter ZIP code for current network: ")
-                location_data = get_lat_lon_from_zip(zipcode)
-            except Exception as e:
-                raise RuntimeError(
-                    "Location information unavailable: lookup failed"
-                ) from e
-
-            debug_print("ZIP lookup", start_time)
-
-            network_cache[network_key] = NetworkLocation(
-                ipv4=ipv4,
-                ipv6=ipv6,
-                latitude=location_data["latitude"],
-                longitude=location_data["longitude"],
-                zipcode=zipcode,
-            )
-            try:
-                save_network_cache(network_cache)
-                debug_print("Save cache", start_time)
-            except Exception:
-                pass  # Ignore cache save failures
+        network_key = create_network_key(ipv4, ipv6) if ipv4 or ipv6 else None
+        _fingerprint = (time.monotonic(), network_key)
+    return network_key
 
-        location = network_cache[network_key]
-        return (location.latitude, location.longitude)
 
+def refresh_location(
+    cache_path: str, network_key: str, location: NetworkLocation
+) -> NetworkLocation:
+    """Look up a stale location's ZIP code again, keeping the old coordinates on failure"""
+    if not location.zipcode:
+        return location
+    try:
+        location_data = get_lat_lon_from_zip(location.zipcode)
+    except (ValueError, RuntimeError) as e:
+        print(f"Warning: could not refresh location: {e}")
+        return location
+    refreshed = NetworkLocation(
+        ipv4=location.ipv4,
+        ipv6=location.ipv6,
+        latitude=location_data["latitude"],
+        longitude=location_data["longitude"],
+        zipcode=location.zipcode,
+        updated=time.time(),
+    )
+    save_network_location(cache_path, network_key, refreshed)
+    return refreshed
+
+
+def resolve_location(cache_path: str, progress: Dict[str, Any]) -> None:
+    """Find the cached location of the current network, refreshing it once stale
+
+    Results go into progress as they are known, so a caller that stops waiting
+    can still use the stale location.
+    """
+    try:
+        network_key = network_fingerprint()
+        if network_key is None:
+            raise ValueError("no network detected")
+        progress["key"] = network_key
+        cache = read_cached(cache_path, load_network_cache, _location_cache)
+        location = progress["location"] = cache.get(network_key)
+        if location is not None and not location.is_fresh():
+            progress["location"] = refresh_location(cache_path, network_key, location)
+    except Exception as e:  # pylint: disable=broad-except
+        progress["error"] = e
+
+
+def ask_for_location(cache_path: str, network_key: str) -> NetworkLocation:
+    """Ask for the ZIP code of a network not in the cache and save its location."""
+    print(f"Network not found in cache ({network_key})")
+    try:
+        zipcode = input("Enter ZIP code for current network: ")
+        location_data = get_lat_lon_from_zip(zipcode)
     except Exception as e:
-        raise RuntimeError(f"Location information unavailable: {str(e)}")
+        raise RuntimeError("Location information unavailable: lookup failed") from e
+
+    ipv4, ipv6 = get_network_addresses()
+    location = NetworkLocation(
+        ipv4=ipv4,
+        ipv6=ipv6,
+        latitude=location_data["latitude"],
+        longitude=location_data["longitude"],
+        zipcode=zipcode,
+        updated=time.time(),
+    )
+    try:
+        save_network_location(cache_path, network_key, location)
+    except OSError:
+        pass  # Ignore cache save failures
+    return location
+
+
+@atexit.register
+def finish_refreshes(timeout: float = HTTP_TIMEOUT_SECONDS) -> None:
+    """Give lookups that overran their budget up to timeout seconds to be saved"""
+    deadline = time.monotonic() + timeout
+    while _refreshes:
+        _refreshes.pop().join(max(0.0, deadline - time.monotonic()))
+
+
+def get_location(budget_ms: float = LOCATION_BUDGET_MS) -> Tuple[float, float]:
+    """Get location based on network IPs and saved/input location data.
+
+    Spends at most budget_ms, except when asking for the ZIP code of a new network.
+    """
+    cache_path = network_cache_path()
+    progress: Dict[str, Any] = {}
+    worker = threading.Thread(
+        target=resolve_location, args=(cache_path, progress), daemon=True
+    )
+    worker.start()
+    worker.join(budget_ms / 1000)
+
+    location = progress.get("location")
+    if worker.is_alive():
+        # Still refreshing (or detecting the network): use what is known so far,
+        # letting the lookup finish in the background
+        _refreshes.append(worker)
+        if location is None:
+            increment("location_lookups_total", result="timeout")
+            raise RuntimeError(
+                f"Location information unavailable: lookup took over {budget_ms:.0f}ms"
+            )
+        increment("location_lookups_total", result="stale")
+    elif "error" in progress:
+        raise RuntimeError(f"Location information unavailable: {progress['error']}")
+    elif location is None:
+        increment("location_lookups_total", result="new")
+        location = ask_for_location(cache_path, progress["key"])
+    else:
+        increment("location_lookups_total", result="cached")
+    return (location.latitude, location.longitude)
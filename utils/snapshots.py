@@ -0,0 +1,256 @@
+"""Deduplicated snapshot history of entries
+
+Each version of an entry is split into content-defined chunks (a gear rolling
+hash picks the boundaries, so appending to an entry leaves the earlier chunks
+unchanged) and stored as zlib-compressed files named by their SHA-256. A
+version is a line in the entry's manifest listing its chunks, so recording a
+version only writes the chunks not stored before.
+
+Usage: python -m utils.snapshots {list,restore,diff,prune} ...
+"""
+
+import os
+import json
+import time
+import zlib
+import difflib
+import hashlib
+import argparse
+from typing import Iterator, List, Optional
+from config.settings import (
+    SNAPSHOT_DIR,
+    SNAPSHOT_KEEP_VERSIONS,
+    SNAPSHOT_KEEP_DAYS,
+    SNAPSHOT_PRUNE_INTERVAL_SECONDS,
+)
+from utils.locking import locked, atomic_write
+
+MIN_CHUNK = 256
+MAX_CHUNK = 8192
+# Boundary when the top 10 bits of the hash (which depend on the last 32
+# bytes) are zero: chunks average about 1KB
+CHUNK_MASK = ((1 << 10) - 1) << 22
+# Chunks written this recently are never swept, as their version may not be saved yet
+SWEEP_GRACE_SECONDS = 60 * 60
+PRUNE_MARKER = ".pruned"
+
+GEAR = [
+    int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "big") for i in range(256)
+]
+
+
+def chunk_boundaries(data: bytes) -> Iterator[int]:
+    """Yield the end offset of each content-defined chunk"""
+    start = 0
+    length = len(data)
+    while start < length:
+        end = min(start + MAX_CHUNK, length)
+        rolling = 0
+        position = start + MIN_CHUNK
+        while position < end:
+            rolling = ((rolling << 1) + GEAR[data[position]]) & 0xFFFFFFFF
+            position += 1
+            if not rolling & CHUNK_MASK:
+                break
+        else:
+            position = end
+        yield position
+        start = position
+
+
+def split_chunks(data: bytes) -> List[bytes]:
+    """Split data into content-defined chunks"""
+    chunks = []
+    start = 0
+    for end in chunk_boundaries(data):
+        chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+class SnapshotStore:
+    """Versions of entries in a directory of chunks and per-entry manifests"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.manifest_dir = os.path.join(root, "versions")
+
+    def chunk_path(self, digest: str) -> str:
+        """File holding a chunk"""
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def manifest_path(self, name: str) -> str:
+        """File listing the versions of an entry"""
+        return os.path.join(self.manifest_dir, f"{name}.jsonl")
+
+    def versions(self, name: str) -> List[dict]:
+        """Recorded versions of an entry, oldest first"""
+        try:
+            with open(self.manifest_path(name), "r", encoding="utf-8") as file:
+                return [json.loads(line) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def names(self) -> List[str]:
+        """Entries with recorded versions"""
+        if not os.path.isdir(self.manifest_dir):
+            return []
+        return sorted(
+            name[: -len(".jsonl")]
+            for name in os.listdir(self.manifest_dir)
+            if name.endswith(".jsonl")
+        )
+
+    def _write_chunk(self, chunk: bytes) -> str:
+        digest = hashlib.sha256(chunk).hexdigest()
+        chunk_path = self.chunk_path(digest)
+        try:
+            # Reused chunks are touched so a concurrent prune keeps them
+            os.utime(chunk_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+            temp_path = f"{chunk_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(zlib.compress(chunk))
+            os.replace(temp_path, chunk_path)
+        return digest
+
+    def record(self, name: str, content: str) -> Optional[dict]:
+        """Record a version of an entry unless it matches the latest one"""
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        manifest_path = self.manifest_path(name)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        with locked(manifest_path):
+            versions = self.versions(name)
+            if versions and versions[-1]["sha256"] == digest:
+                return None
+            version = {
+                "time": time.time(),
+                "sha256": digest,
+                "size": len(data),
+                "chunks": [self._write_chunk(chunk) for chunk in split_chunks(data)],
+            }
+            with open(manifest_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(version) + "\n")
+        return version
+
+    def restore(self, name: str, index: int = -1) -> str:
+        """Content of a version of an entry (the latest by default)"""
+        version = self.versions(name)[index]
+        chunks = []
+        for digest in version["chunks"]:
+            with open(self.chunk_path(digest), "rb") as file:
+                chunks.append(zlib.decompress(file.read()))
+        data = b"".join(chunks)
+        if hashlib.sha256(data).hexdigest() != version["sha256"]:
+            raise ValueError(f"Snapshot of {name} is damaged")
+        return data.decode("utf-8")
+
+    def diff(self, name: str, old: int = -2, new: int = -1) -> str:
+        """Unified diff between two versions of an entry"""
+        return "".join(
+            difflib.unified_diff(
+                self.restore(name, old).splitlines(keepends=True),
+                self.restore(name, new).splitlines(keepends=True),
+                fromfile=f"{name}@{old}",
+                tofile=f"{name}@{new}",
+            )
+        )
+
+    def prune(
+        self,
+        keep_versions: int = SNAPSHOT_KEEP_VERSIONS,
+        keep_days: float = SNAPSHOT_KEEP_DAYS,
+    ) -> int:
+        """Apply the retention policy and remove unused chunks
+
+        Each entry keeps its newest keep_versions versions, except that versions
+        older than keep_days go, always leaving the newest one. Returns the
+        number of versions removed.
+        """
+        cutoff = time.time() - keep_days * 24 * 60 * 60
+        removed = 0
+        referenced = set()
+        for name in self.names():
+            manifest_path = self.manifest_path(name)
+            with locked(manifest_path):
+                versions = self.versions(name)
+                older = versions[-max(keep_versions, 1) : -1]
+                kept = [v for v in older if v["time"] >= cutoff]
+                kept += versions[-1:]
+                if len(kept) != len(versions):
+                    atomic_write(
+                        manifest_path, "".join(json.dumps(v) + "\n" for v in kept)
+                    )
+                    removed += len(versions) - len(kept)
+            for version in kept:
+                referenced.update(version["chunks"])
+
+        grace = time.time() - SWEEP_GRACE_SECONDS
+        if os.path.isdir(self.chunk_dir):
+            for prefix in os.scandir(self.chunk_dir):
+                for chunk in os.scandir(prefix.path):
+                    if chunk.name in referenced or chunk.stat().st_mtime > grace:
+                        continue
+                    os.remove(chunk.path)
+        return removed
+
+    def prune_if_due(self, interval: float = SNAPSHOT_PRUNE_INTERVAL_SECONDS) -> None:
+        """Prune at most once per interval"""
+        marker = os.path.join(self.root, PRUNE_MARKER)
+        try:
+            if time.time() - os.path.getmtime(marker) < interval:
+                return
+        except FileNotFoundError:
+            if not os.path.isdir(self.root):
+                return
+        self.prune()
+        with open(marker, "w", encoding="utf-8"):
+            pass
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Snapshot store in the reference directory"""
+    # pylint: disable=import-outside-toplevel
+    from config.state import get_state
+
+    return SnapshotStore(get_state().reference_file(SNAPSHOT_DIR))
+
+
+def main():
+    """List, restore, diff or prune entry versions from the command line"""
+    parser = argparse.ArgumentParser(description="Snapshot history of entries")
+    parser.add_argument("store", help="snapshot directory (personal/history)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="list entries or versions of an entry")
+    listing.add_argument("name", nargs="?")
+    restore = commands.add_parser("restore", help="print a version of an entry")
+    restore.add_argument("name")
+    restore.add_argument("index", type=int, nargs="?", default=-1)
+    diff = commands.add_parser("diff", help="diff two versions of an entry")
+    diff.add_argument("name")
+    diff.add_argument("old", type=int, nargs="?", default=-2)
+    diff.add_argument("new", type=int, nargs="?", default=-1)
+    commands.add_parser("prune", help="apply the retention policy")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    if args.command == "list" and args.name:
+        for index, version in enumerate(store.versions(args.name)):
+            moment = time.localtime(version["time"])
+            moment = time.strftime("%Y-%m-%d %H:%M:%S", moment)
+            print(f"{index}\t{moment}\t{version['size']} bytes")
+    elif args.command == "list":
+        print("\n".join(store.names()))
+    elif args.command == "restore":
+        print(store.restore(args.name, args.index), end="")
+    elif args.command == "diff":
+        print(store.diff(args.name, args.old, args.new), end="")
+    else:
+        print(f"Removed {store.prune()} versions")
+
+
+if __name__ == "__main__":
+    main()
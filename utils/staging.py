@@ -0,0 +1,177 @@
+"""Local write-behind staging for the synced journal folder
+
+Entries are read and written in a fast local staging directory while the
+synced (iCloud) folder only receives finished copies: a flusher copies files
+whose checksum changed since they were last flushed. When both copies changed,
+or on startup, the newer copy (by mtime) wins.
+
+Usage: python -m utils.staging flush LOCAL_DIR SYNCED_DIR [SNAPSHOT_DIR]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import subprocess
+from typing import Dict, Optional
+from config.settings import (
+    SCRIPT_DIR,
+    STAGING_FLUSH_INTERVAL_SECONDS,
+    STAGING_IDLE_EXIT_SECONDS,
+)
+from utils.locking import locked, atomic_write
+from utils.snapshots import SnapshotStore
+
+MANIFEST_FILE = ".staging.json"
+FLUSHER_LOCK_FILE = ".flusher"
+
+
+def file_digest(file_path: str) -> Optional[str]:
+    """SHA-256 of a file, or None if it does not exist"""
+    try:
+        with open(file_path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def copy_file(source: str, dest: str) -> str:
+    """Copy a file atomically, keeping its mtime, and return its checksum"""
+    with open(source, "rb") as file:
+        mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+        data = file.read()
+    atomic_write(dest, data, mtime_ns)
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_manifest(local_dir: str) -> Dict[str, str]:
+    """Checksums of files as they were last flushed"""
+    try:
+        with open(os.path.join(local_dir, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(local_dir: str, manifest: Dict[str, str]) -> None:
+    """Store checksums of flushed files"""
+    atomic_write(os.path.join(local_dir, MANIFEST_FILE), json.dumps(manifest))
+
+
+def update_manifest(local_dir: str, name: str, digest: str) -> None:
+    """Record one flushed file's checksum, holding the manifest lock"""
+    with locked(os.path.join(local_dir, MANIFEST_FILE)):
+        manifest = load_manifest(local_dir)
+        manifest[name] = digest
+        save_manifest(local_dir, manifest)
+
+
+def snapshot_copies(
+    history: Optional[SnapshotStore], name: str, older_path: str, newer_path: str
+) -> None:
+    """Record the copy about to be overwritten, then the one replacing it"""
+    if history is None:
+        return
+    for file_path in (older_path, newer_path):
+        if os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as file:
+                history.record(name, file.read())
+
+
+def reconcile(
+    name: str,
+    local_dir: str,
+    synced_dir: str,
+    history: Optional[SnapshotStore] = None,
+) -> Optional[str]:
+    """Make both copies of a file the same, newer copy winning
+
+    The overwritten copy is kept in history if given. Returns "local" or
+    "synced" for the copy that was updated, or None.
+    """
+    local_path = os.path.join(local_dir, name)
+    synced_path = os.path.join(synced_dir, name)
+    with locked(local_path):
+        local_digest = file_digest(local_path)
+        synced_digest = file_digest(synced_path)
+        if local_digest == synced_digest:
+            updated = None
+        elif synced_digest is None or (
+            local_digest is not None
+            and os.path.getmtime(local_path) > os.path.getmtime(synced_path)
+        ):
+            snapshot_copies(history, name, synced_path, local_path)
+            synced_digest = copy_file(local_path, synced_path)
+            updated = "synced"
+        else:
+            snapshot_copies(history, name, local_path, synced_path)
+            local_digest = copy_file(synced_path, local_path)
+            updated = "local"
+        if local_digest is not None:
+            update_manifest(local_dir, name, local_digest)
+    return updated
+
+
+def flush_once(
+    local_dir: str, synced_dir: str, history: Optional[SnapshotStore] = None
+) -> int:
+    """Copy entries changed since they were last flushed, returning how many"""
+    manifest = load_manifest(local_dir)
+    flushed = 0
+    for entry in os.scandir(local_dir):
+        if not entry.is_file() or not entry.name.endswith(".txt"):
+            continue
+        if entry.name.startswith("."):
+            continue
+        if file_digest(entry.path) == manifest.get(entry.name):
+            continue
+        synced_digest = file_digest(os.path.join(synced_dir, entry.name))
+        if synced_digest not in (None, manifest.get(entry.name)):
+            # Changed on both sides since the last flush
+            reconcile(entry.name, local_dir, synced_dir, history)
+            manifest = load_manifest(local_dir)
+        else:
+            with locked(entry.path):
+                digest = copy_file(entry.path, os.path.join(synced_dir, entry.name))
+                update_manifest(local_dir, entry.name, digest)
+            manifest[entry.name] = digest
+        flushed += 1
+    return flushed
+
+
+def run_flusher(
+    local_dir: str, synced_dir: str, history_dir: Optional[str] = None
+) -> None:
+    """Flush changes until nothing has changed for STAGING_IDLE_EXIT_SECONDS"""
+    history = SnapshotStore(history_dir) if history_dir else None
+    try:
+        with locked(os.path.join(local_dir, FLUSHER_LOCK_FILE), timeout=0):
+            last_change = time.monotonic()
+            while time.monotonic() - last_change < STAGING_IDLE_EXIT_SECONDS:
+                if flush_once(local_dir, synced_dir, history):
+                    last_change = time.monotonic()
+                time.sleep(STAGING_FLUSH_INTERVAL_SECONDS)
+    except TimeoutError:
+        pass  # Another flusher is already running
+
+
+def start_flusher(
+    local_dir: str, synced_dir: str, history_dir: Optional[str] = None
+) -> None:
+    """Start a background flusher that outlives this process"""
+    command = [sys.executable, "-m", "utils.staging", "flush", local_dir, synced_dir]
+    subprocess.Popen(  # pylint: disable=consider-using-with
+        command + ([history_dir] if history_dir else []),
+        cwd=SCRIPT_DIR,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] != "flush":
+        sys.exit(__doc__.splitlines()[-1])
+    run_flusher(*sys.argv[2:])
@@ -1,83 +1,164 @@
 """Entry module for journal writing operations"""
 
+import os
 import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from config.state import get_state
 from config.settings import GLOBAL_WORDCOUNT_GOAL
 from utils.file_ops import get_content_and_cut_dictionary
-from writer.wordcount import (
-    get_ia_writer_style_wordcount_from_string,
-    get_ia_writer_style_wordcount_from_entry,
+from utils.locking import locked, atomic_write
+from utils.metrics import increment
+from utils.snapshots import get_snapshot_store
+from writer.wordcount import get_ia_writer_style_wordcount_from_entry
+from writer.template import get_template
+from writer.prerender import (
+    PRERENDER_TIMESTAMP,
+    save_prerendered_content,
+    take_prerendered_content,
 )
-from content.tarot import pull_tarot_card
-from content.stoic import get_stoic_entries
-from content.questions import get_questions_not_in_entry
+from utils.dates import generate_title
+from content.providers import PROVIDERS, needed_providers, run_providers
+from content.stoic import stoic_json_set_progress
+
+
+def build_morning_content(
+    title: str,
+    timestamp_hhmm: str,
+    date: Optional[datetime] = None,
+    read_only: bool = False,
+) -> Tuple[str, Optional[dict]]:
+    """Build morning journal content for a date, with the stoic progress it uses up
+
+    With read_only, nothing is written, not even the content cache.
+    """
+    values = {"title": title, "timestamp": timestamp_hhmm}
+    results = run_providers(needed_providers(), date, read_only)
+    for name, (output, _) in results.items():
+        values[name] = output + PROVIDERS[name].template_suffix
+    progress = results["stoic"][1] if "stoic" in results else None
+    initial_content = get_template("morning").render(values, GLOBAL_WORDCOUNT_GOAL)
+    return initial_content, progress
 
 
 def create_morning_content() -> str:
-    """Create initial morning journal content"""
+    """Create initial morning journal content, using pre-rendered content if available"""
     state = get_state()
-    initial_content = f"""{state.title_now}\n"""
-    initial_content += f"""#MorningPages, started at {state.timestamp_hhmm}\n"""
-    initial_content += "\n\n\nGoal WC: MORNINGWORDCOUNT\n"
-    if state.args["tarot"]:
-        initial_content += f"{pull_tarot_card()}\n"
-    if state.args["questions"]:
-        initial_content += get_questions_not_in_entry()
-    if state.args["stoic_prompt"]:
-        initial_content += get_stoic_entries()
-    current_wc = get_ia_writer_style_wordcount_from_string(initial_content)
-    goal_wc = current_wc + GLOBAL_WORDCOUNT_GOAL
-    initial_content = initial_content.replace("MORNINGWORDCOUNT", str(goal_wc))
+    prerendered = take_prerendered_content(state.title_now)
+    increment(
+        "cache_hits_total" if prerendered else "cache_misses_total", cache="prerender"
+    )
+    if prerendered:
+        initial_content, progress = prerendered
+        initial_content = initial_content.replace(
+            PRERENDER_TIMESTAMP, state.timestamp_hhmm
+        )
+    else:
+        initial_content, progress = build_morning_content(
+            state.title_now, state.timestamp_hhmm
+        )
+    if progress:
+        stoic_json_set_progress(progress)
     return initial_content
 
 
+def prerender_next_morning() -> None:
+    """Render tomorrow's morning content ahead of time"""
+    state = get_state()
+    date = state.base_date + timedelta(days=1)
+    title = generate_title(date)
+    content, progress = build_morning_content(title, PRERENDER_TIMESTAMP, date)
+    save_prerendered_content(title, content, progress)
+
+
+def snapshot_entry(content: str) -> None:
+    """Record a version of today's entry in the snapshot history"""
+    state = get_state()
+    if state.args["test"]:
+        return
+    try:
+        get_snapshot_store().record(os.path.basename(state.entry_file_path), content)
+    except OSError as e:
+        print(f"Warning: could not snapshot entry: {e}")
+
+
 def create_entry(content: str) -> None:
     """Create a new journal entry"""
     state = get_state()
     if state.args["test"]:
         print(content)
         return
-    with open(state.entry_file_path, "w", encoding="utf-8") as file:
-        file.write(content)
+    with locked(state.entry_file_path):
+        # Another invocation may have created it since we checked
+        if os.path.exists(state.entry_file_path):
+            print(f"Entry already exists, not overwriting: {state.entry_file_path}")
+            return
+        atomic_write(state.entry_file_path, content)
+        snapshot_entry(content)
+    increment("entries_created_total")
 
 
 def update_entry_with_new_content(
     new_content: str, expected_ending: str, exclusion_re: str = ""
-) -> None:
-    """Update existing entry with new content"""
+) -> bool:
+    """Update existing entry with new content, returning whether it was added"""
+    state = get_state()
+    with locked(state.entry_file_path):
+        with open(state.entry_file_path, "r", encoding="utf-8") as file:
+            content = file.read()
+        if exclusion_re and re.search(exclusion_re, content, flags=re.MULTILINE):
+            return False
+        previous = content
+        if not content.endswith("\n\n"):
+            content += expected_ending
+        content += new_content
+        if state.args["test"]:
+            print(content)
+            return True
+        # Keeps edits made in the editor since the last snapshot
+        snapshot_entry(previous)
+        atomic_write(state.entry_file_path, content)
+        snapshot_entry(content)
+    increment("entries_updated_total")
+    return True
+
+
+def update_entry_with_providers() -> None:
+    """Add the content blocks asked for that are not in today's entry yet"""
     state = get_state()
-    content = ""
     with open(state.entry_file_path, "r", encoding="utf-8") as file:
         content = file.read()
-    if exclusion_re and re.search(exclusion_re, content, flags=re.MULTILINE):
-        return
-    if not content.endswith("\n\n"):
-        content += expected_ending
-    content += new_content
-    if state.args["test"]:
-        print(content)
-        return
-    with open(state.entry_file_path, "w", encoding="utf-8") as file:
-        file.write(content)
+    providers = needed_providers(content)
+    results = run_providers(providers)
+    for provider in providers:
+        output, pending = results[provider.name]
+        # The block may have been added since the entry was read
+        if output and not update_entry_with_new_content(
+            output, "\n", provider.exclusion_re
+        ):
+            continue
+        if pending and provider.commit:
+            provider.commit(pending)
 
 
 def get_evening_update_string() -> str:
     """Generate evening journal update string"""
     state = get_state()
-    content = f"\n#EveningPages, started at {state.timestamp_hhmm}\n\n\n\n"
-    current_wc = get_ia_writer_style_wordcount_from_string(content)
-    current_wc += get_ia_writer_style_wordcount_from_entry()
-    goal_wordcount = str(current_wc + GLOBAL_WORDCOUNT_GOAL + 3)
-    content += f"Goal WC: {goal_wordcount}"
-    return content
+    return get_template("evening").render(
+        {"title": state.title_now, "timestamp": state.timestamp_hhmm},
+        get_ia_writer_style_wordcount_from_entry() + GLOBAL_WORDCOUNT_GOAL,
+    )
 
 
 def move_stoics_to_end() -> None:
     """Move stoic prompts to end of entry"""
     state = get_state()
-    cut_section = get_content_and_cut_dictionary(
-        state.entry_file_path, r"^- Daily Stoic Prompt,.*", r"^#EveningPages.*"
-    )
-    with open(state.entry_file_path, "w", encoding="utf-8") as file:
-        file.write(cut_section["content"] + "\n\n")
-        file.write(cut_section["cut"])
+    with locked(state.entry_file_path):
+        with open(state.entry_file_path, "r", encoding="utf-8") as file:
+            snapshot_entry(file.read())
+        cut_section = get_content_and_cut_dictionary(
+            state.entry_file_path, r"^- Daily Stoic Prompt,.*", r"^#EveningPages.*"
+        )
+        content = cut_section["content"] + "\n\n" + cut_section["cut"]
+        atomic_write(state.entry_file_path, content)
+        snapshot_entry(content)
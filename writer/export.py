@@ -0,0 +1,221 @@
+"""Streaming export of the journal archive
+
+The export is a chain of generators (scan -> parse -> transform -> write), so
+only the entries in flight are held in memory whatever the size of the archive.
+Parsing can be spread across worker processes with a bounded window of pending
+entries, keeping output in entry order.
+"""
+
+import os
+import re
+import json
+import html
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, IO, Iterable, Iterator
+from writer.wordcount import get_ia_writer_style_wordcount_from_string
+
+ENTRY_FILE_RE = re.compile(r"^\d{8} .*\.txt$")
+SECTION_RE = re.compile(r"^#(Morning|Evening)Pages(?:, started at (\d+))?\s*$")
+STOIC_RE = re.compile(r"^- Daily Stoic Prompt, (\d+/\d+):")
+STOIC_ANSWER_RE = re.compile(r"^\t- (Morning|Evening):")
+
+EXPORT_FORMATS = ("jsonl", "markdown", "html")
+EXPORT_EXTENSIONS = {"jsonl": "jsonl", "markdown": "md", "html": "html"}
+
+
+def scan_entries(journal_path: str) -> Iterator[str]:
+    """Yield entry file paths in date order"""
+    names = sorted(
+        entry.name
+        for entry in os.scandir(journal_path)
+        if entry.is_file() and ENTRY_FILE_RE.match(entry.name)
+    )
+    for name in names:
+        yield os.path.join(journal_path, name)
+
+
+def parse_entry_text(text: str) -> dict:
+    """Split an entry into its title and sections"""
+    lines = text.splitlines()
+    title = lines[0] if lines else ""
+    entry = {
+        "title": title,
+        "date": f"{title[0:4]}-{title[4:6]}-{title[6:8]}",
+        "started_at": {},
+        "morning": [],
+        "evening": [],
+        "tarot": None,
+        "zodiac": None,
+        "stoic": [],
+    }
+    section = "morning"
+    stoic = None
+    answer = None
+
+    for line in lines[1:]:
+        if stoic is not None:
+            if not stoic["question"] and not line.startswith("\t"):
+                stoic["question"] = line
+                continue
+            match = STOIC_ANSWER_RE.match(line)
+            if match:
+                answer = match.group(1).lower()
+                continue
+            if line.startswith("\t"):
+                text_line = line.strip().lstrip("-").strip()
+                if answer and text_line:
+                    stoic[answer].append(text_line)
+                continue
+            stoic = None
+            answer = None
+
+        match = SECTION_RE.match(line)
+        if match:
+            section = match.group(1).lower()
+            if match.group(2):
+                entry["started_at"][section] = match.group(2)
+            continue
+        match = STOIC_RE.match(line)
+        if match:
+            stoic = {"date": match.group(1), "question": "", "morning": [], "evening": []}
+            entry["stoic"].append(stoic)
+            continue
+        if line.startswith("Tarot: "):
+            entry["tarot"] = line[len("Tarot: ") :]
+        elif line.startswith("Zodiac: "):
+            entry["zodiac"] = line[len("Zodiac: ") :]
+        elif not line.startswith("Goal WC:"):
+            entry[section].append(line)
+
+    for section in ("morning", "evening"):
+        entry[section] = "\n".join(entry[section]).strip("\n")
+    for stoic in entry["stoic"]:
+        stoic["morning"] = "\n".join(stoic["morning"])
+        stoic["evening"] = "\n".join(stoic["evening"])
+    return entry
+
+
+def parse_entry(file_path: str) -> dict:
+    """Read and parse one entry file"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        return parse_entry_text(file.read())
+
+
+def parse_entries(paths: Iterable[str], workers: int = 1) -> Iterator[dict]:
+    """Parse entries in order, in worker processes if workers > 1"""
+    if workers <= 1:
+        yield from map(parse_entry, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for file_path in paths:
+            pending.append(executor.submit(parse_entry, file_path))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def add_word_counts(entries: Iterable[dict]) -> Iterator[dict]:
+    """Add iA Writer style word counts of the morning and evening pages"""
+    for entry in entries:
+        entry["words"] = {
+            section: get_ia_writer_style_wordcount_from_string(entry[section])
+            for section in ("morning", "evening")
+        }
+        yield entry
+
+
+def write_jsonl(entries: Iterable[dict], out: IO[str]) -> int:
+    """Write one JSON object per line"""
+    count = 0
+    for entry in entries:
+        out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def entry_to_markdown(entry: dict) -> str:
+    """Render one entry as a Markdown section"""
+    result = f"# {entry['title']}\n\n"
+    if entry["tarot"]:
+        result += f"Tarot: {entry['tarot']}\n\n"
+    if entry["zodiac"]:
+        result += f"Zodiac: {entry['zodiac']}\n\n"
+    for section in ("morning", "evening"):
+        if entry[section] or section in entry["started_at"]:
+            started_at = entry["started_at"].get(section, "")
+            result += f"## {section.capitalize()} Pages ({started_at})\n\n"
+            result += f"{entry[section]}\n\n"
+    for stoic in entry["stoic"]:
+        result += f"## Daily Stoic Prompt, {stoic['date']}\n\n{stoic['question']}\n\n"
+        for answer in ("morning", "evening"):
+            if stoic[answer]:
+                result += f"- {answer.capitalize()}: {stoic[answer]}\n"
+        result += "\n"
+    return result
+
+
+def write_markdown(entries: Iterable[dict], out: IO[str]) -> int:
+    """Write all entries into a single Markdown document"""
+    count = 0
+    for entry in entries:
+        if count:
+            out.write("---\n\n")
+        out.write(entry_to_markdown(entry))
+        count += 1
+    return count
+
+
+def entry_to_html(entry: dict) -> str:
+    """Render one entry as an HTML article"""
+    escape = html.escape
+    result = f'<article id="{escape(entry["date"])}">\n'
+    result += f"<h1>{escape(entry['title'])}</h1>\n"
+    for label in ("tarot", "zodiac"):
+        if entry[label]:
+            result += f'<p class="{label}">{escape(entry[label])}</p>\n'
+    for section in ("morning", "evening"):
+        if entry[section]:
+            result += f"<h2>{section.capitalize()} Pages</h2>\n"
+            for paragraph in re.split(r"\n\s*\n", entry[section]):
+                result += f"<p>{escape(paragraph).replace(chr(10), '<br>')}</p>\n"
+    for stoic in entry["stoic"]:
+        result += f"<h2>Daily Stoic Prompt, {escape(stoic['date'])}</h2>\n"
+        result += f"<blockquote>{escape(stoic['question'])}</blockquote>\n<ul>\n"
+        for answer in ("morning", "evening"):
+            if stoic[answer]:
+                result += f"<li>{answer.capitalize()}: {escape(stoic[answer])}</li>\n"
+        result += "</ul>\n"
+    return result + "</article>\n"
+
+
+def write_html(entries: Iterable[dict], out: IO[str]) -> int:
+    """Write all entries into a single static HTML page"""
+    out.write(
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        "<title>Journal</title>\n</head>\n<body>\n"
+    )
+    count = 0
+    for entry in entries:
+        out.write(entry_to_html(entry))
+        count += 1
+    out.write("</body>\n</html>\n")
+    return count
+
+
+WRITERS: Dict[str, Callable[[Iterable[dict], IO[str]], int]] = {
+    "jsonl": write_jsonl,
+    "markdown": write_markdown,
+    "html": write_html,
+}
+
+
+def export_journal(
+    journal_path: str, export_format: str, output_path: str, workers: int = 1
+) -> int:
+    """Export every entry in journal_path, returning the number of entries"""
+    entries = add_word_counts(parse_entries(scan_entries(journal_path), workers))
+    with open(output_path, "w", encoding="utf-8") as out:
+        return WRITERS[export_format](entries, out)
@@ -0,0 +1,406 @@
+"""Bulk import of entries exported from other journaling apps
+
+Exports are streamed item by item (a JSON array, a JSON object with an
+"entries" array, JSON Lines, or Markdown with a dated heading per entry).
+Consecutive items on the same day become one entry named by generate_title,
+with items before MORNING_START_HOUR going to the previous day's evening pages
+like a late night run, so only one day's items are held at a time. Entries are
+written by a thread pool. An existing entry keeps its text and gets the items
+it lacks added to the end of their sections; this is also how a day that comes
+up again later in the export is merged, after the earlier part is written. The
+directory is synced every IMPORT_SYNC_BATCH entries and the number of entries
+durably written is saved to a checkpoint, so an interrupted import resumes
+where it left off.
+"""
+
+import os
+import re
+import json
+import time
+import tempfile
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+from config.settings import (
+    MORNING_START_HOUR,
+    EVENING_START_HOUR,
+    IMPORT_SYNC_BATCH,
+)
+from utils.dates import generate_title
+from utils.locking import locked, atomic_write, file_mode
+from utils.snapshots import SnapshotStore
+
+DATE_KEYS = ("creationDate", "date", "created", "created_at", "timestamp")
+TEXT_KEYS = ("text", "body", "content", "entry", "markdown")
+SECTION_HEADING_RE = re.compile(r"^#(Morning|Evening)Pages\b.*$", flags=re.MULTILINE)
+HEADING_DATE_RE = re.compile(r"^#{1,6}\s.*?(\d{4}-\d{2}-\d{2})(?:[ T](\d{1,2}:\d{2}))?")
+JSON_CHUNK_SIZE = 1 << 16
+# Larger timestamps are in milliseconds (in seconds they would be after 5000 AD)
+MILLISECONDS_FROM = 10**11
+
+
+def parse_moment(value) -> Tuple[Optional[datetime], bool]:
+    """Local time of an exported date and whether it had a time of day"""
+    if isinstance(value, bool):
+        return None, False
+    if isinstance(value, (int, float)):
+        if abs(value) >= MILLISECONDS_FROM:
+            value /= 1000
+        try:
+            return datetime.fromtimestamp(value), True
+        except (ValueError, OverflowError, OSError):
+            return None, False
+    if not isinstance(value, str):
+        return None, False
+    # fromisoformat needs a two-digit hour
+    value = re.sub(r"^(\d{4}-\d{2}-\d{2}[ T])(\d:)", r"\g<1>0\2", value.strip())
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None, False
+    if moment.tzinfo:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment, len(value) > 10
+
+
+def item_from_json(data: dict) -> dict:
+    """Normalize an exported JSON object to a moment and text"""
+    value = next((data[key] for key in DATE_KEYS if key in data), None)
+    text = next((data[key] for key in TEXT_KEYS if key in data), "")
+    moment, has_time = parse_moment(value)
+    return {"moment": moment, "has_time": has_time, "text": str(text).strip()}
+
+
+def stream_json_array(file, chunk_size: int = JSON_CHUNK_SIZE) -> Iterator[dict]:
+    """Decode the values of a top-level or "entries" array one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    match = None
+    while not buffer.lstrip().startswith("["):
+        match = re.search(r'"entries"\s*:\s*\[', buffer)
+        if match:
+            break
+        chunk = file.read(chunk_size)
+        if not chunk:
+            raise ValueError("No array of entries found in JSON export")
+        buffer += chunk
+    start = match.end() if match else buffer.index("[") + 1
+    buffer, position = buffer[start:], 0
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            buffer, position = file.read(chunk_size), 0
+            if not buffer:
+                raise ValueError("Unterminated array of entries in JSON export")
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield value
+        if position >= chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+def read_json_items(
+    file_path: str, chunk_size: int = JSON_CHUNK_SIZE
+) -> Iterator[dict]:
+    """Yield items of a JSON export"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        for data in stream_json_array(file, chunk_size):
+            yield item_from_json(data)
+
+
+def read_jsonl_items(file_path: str) -> Iterator[dict]:
+    """Yield items of a JSON Lines export"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield item_from_json(json.loads(line))
+
+
+def read_markdown_items(file_path: str) -> Iterator[dict]:
+    """Yield items of a Markdown export, each starting at a heading with a date"""
+
+    def item(heading, lines):
+        moment, has_time = parse_moment(" ".join(filter(None, heading.groups())))
+        text = re.sub(r"(\n\s*-{3,}\s*)+$", "", "\n".join(lines).strip()).strip()
+        return {"moment": moment, "has_time": has_time, "text": text}
+
+    heading = None
+    lines = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            match = HEADING_DATE_RE.match(line)
+            if match:
+                if heading:
+                    yield item(heading, lines)
+                heading, lines = match, []
+            elif heading:
+                lines.append(line.rstrip("\n"))
+    if heading:
+        yield item(heading, lines)
+
+
+READERS: Dict[str, Callable[[str], Iterator[dict]]] = {
+    "json": read_json_items,
+    "jsonl": read_jsonl_items,
+    "markdown": read_markdown_items,
+}
+IMPORT_EXTENSIONS = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".md": "markdown",
+    ".markdown": "markdown",
+}
+
+
+def place_item(item: dict) -> Tuple[str, str, Optional[str]]:
+    """Title, section and start time an item goes to"""
+    moment = item["moment"]
+    if not item["has_time"]:
+        return generate_title(moment), "morning", None
+    if moment.hour < MORNING_START_HOUR:
+        # Late night counts towards the previous day, as when running the script
+        previous_day = moment - timedelta(days=1)
+        return generate_title(previous_day), "evening", str(2400 + moment.hour)
+    section = "evening" if moment.hour > EVENING_START_HOUR else "morning"
+    return generate_title(moment), section, moment.strftime("%H%M")
+
+
+def render_section(section: str, items: list) -> str:
+    """A section's heading and its items' text, in order"""
+    started_at = next((ts for ts, _ in items if ts), None)
+    heading = f"#{section.capitalize()}Pages"
+    if started_at:
+        heading += f", started at {started_at}"
+    texts = "\n\n".join(text for _, text in items)
+    return f"{heading}\n\n{texts}\n\n"
+
+
+def render_entry(title: str, sections: Dict[str, list]) -> str:
+    """Entry text with each section's items under its heading"""
+    content = f"{title}\n"
+    for section in ("morning", "evening"):
+        if sections[section]:
+            # Items without a time come first; late night times (24HH) sort last
+            items = sorted(sections[section], key=lambda item: item[0] or "")
+            content += render_section(section, items)
+    return content
+
+
+def add_to_sections(content: str, sections: Dict[str, list]) -> str:
+    """Entry text with the items it lacks added at the end of their sections"""
+    for section in ("morning", "evening"):
+        items = [item for item in sections[section] if item[1] not in content]
+        items.sort(key=lambda item: item[0] or "")
+        if not items:
+            continue
+        headings = list(SECTION_HEADING_RE.finditer(content))
+        heading = next((h for h in headings if h[1].lower() == section), None)
+        if heading:
+            end = next(
+                (h.start() for h in headings if h.start() > heading.start()),
+                len(content),
+            )
+            texts = "\n\n".join(text for _, text in items)
+            content = f"{content[:end].rstrip()}\n\n{texts}\n\n{content[end:]}"
+        elif section == "morning" and headings:
+            # Morning pages go before the evening ones
+            start = headings[0].start()
+            content = content[:start] + render_section(section, items) + content[start:]
+        else:
+            content = f"{content.rstrip()}\n\n{render_section(section, items)}"
+    return content
+
+
+def group_entries(
+    items: Iterable[dict], stats: Counter
+) -> Iterator[Tuple[str, Dict[str, list]]]:
+    """Combine consecutive items on the same day into (title, sections)"""
+    title = None
+    sections = {"morning": [], "evening": []}
+    for item in items:
+        if item["moment"] is None or not item["text"]:
+            stats["invalid"] += 1
+            continue
+        item_title, section, started_at = place_item(item)
+        if item_title != title:
+            if title:
+                yield title, sections
+            title, sections = item_title, {"morning": [], "evening": []}
+        sections[section].append((started_at, item["text"]))
+    if title:
+        yield title, sections
+
+
+def append_to_entry(
+    file_path: str, sections: Dict[str, list], history: Optional[SnapshotStore] = None
+) -> str:
+    """Add imported items to an existing entry: "appended" or "unchanged"
+
+    The entry before and after is kept in history if given.
+    """
+    with locked(file_path):
+        with open(file_path, "r", encoding="utf-8") as file:
+            existing = file.read()
+        # Items already there were imported before (or written by hand)
+        content = add_to_sections(existing, sections)
+        if content == existing:
+            return "unchanged"
+        if history is not None:
+            history.record(os.path.basename(file_path), existing)
+        atomic_write(file_path, content)
+        if history is not None:
+            history.record(os.path.basename(file_path), content)
+    return "appended"
+
+
+def write_entry(
+    journal_path: str,
+    title: str,
+    sections: Dict[str, list],
+    history: Optional[SnapshotStore] = None,
+) -> str:
+    """Write or add to an entry: "written", "appended" or "unchanged" """
+    file_path = os.path.join(journal_path, f"{title}.txt")
+    fd, temp_path = tempfile.mkstemp(
+        dir=journal_path, prefix=f".{title}.", suffix=".import"
+    )
+    try:
+        os.chmod(temp_path, file_mode(file_path))
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(render_entry(title, sections))
+            file.flush()
+            os.fsync(file.fileno())
+        # Linking fails instead of replacing an existing entry
+        os.link(temp_path, file_path)
+        return "written"
+    except FileExistsError:
+        return append_to_entry(file_path, sections, history)
+    finally:
+        os.unlink(temp_path)
+
+
+def sync_directory(directory: str) -> None:
+    """Make the names of newly written files durable"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def source_fingerprint(source: str) -> dict:
+    """What a checkpoint was saved for"""
+    stat = os.stat(source)
+    return {
+        "source": os.path.abspath(source),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def load_checkpoint(checkpoint_path: str, source: str) -> int:
+    """Entries already written from this source"""
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as file:
+            checkpoint = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    if checkpoint.get("fingerprint") != source_fingerprint(source):
+        return 0
+    return checkpoint.get("done", 0)
+
+
+def save_checkpoint(checkpoint_path: str, source: str, done: int) -> None:
+    """Record entries durably written from this source"""
+    atomic_write(
+        checkpoint_path,
+        json.dumps({"fingerprint": source_fingerprint(source), "done": done}),
+    )
+
+
+def import_journal(
+    source: str,
+    journal_path: str,
+    checkpoint_path: str,
+    source_format: Optional[str] = None,
+    workers: int = 4,
+    history: Optional[SnapshotStore] = None,
+) -> dict:
+    """Import an export into journal_path, returning counts and entries per second
+
+    Existing entries that are added to are kept in history if given.
+    """
+    started = time.perf_counter()
+    if source_format is None:
+        extension = os.path.splitext(source)[1].lower()
+        if extension not in IMPORT_EXTENSIONS:
+            raise ValueError(f"Unknown export format: {source}")
+        source_format = IMPORT_EXTENSIONS[extension]
+    stats = Counter()
+    resumed = load_checkpoint(checkpoint_path, source)
+    done = resumed
+    unsynced = 0
+    pending = deque()
+    # Latest unfinished write of each day, which a later part of it waits for
+    latest: Dict[str, Future] = {}
+
+    def write_after(previous: Optional[Future], title: str, sections: dict) -> str:
+        if previous is not None:
+            previous.result()
+        return write_entry(journal_path, title, sections, history)
+
+    def finish(title: str, future: Future) -> None:
+        nonlocal done, unsynced
+        if latest.get(title) is future:
+            del latest[title]
+        stats[future.result()] += 1
+        done += 1
+        unsynced += 1
+        if unsynced >= IMPORT_SYNC_BATCH:
+            sync_directory(journal_path)
+            save_checkpoint(checkpoint_path, source, done)
+            unsynced = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        entries = group_entries(READERS[source_format](source), stats)
+        for index, (title, sections) in enumerate(entries):
+            if index < resumed:
+                continue
+            # Earlier writes are started first, so waiting for one cannot deadlock
+            future = executor.submit(write_after, latest.get(title), title, sections)
+            latest[title] = future
+            pending.append((title, future))
+            # Entries finish in order so the checkpoint never skips one
+            if len(pending) >= max(1, workers) * 4:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    sync_directory(journal_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    seconds = time.perf_counter() - started
+    written = done - resumed
+    return {
+        "written": stats["written"],
+        "appended": stats["appended"],
+        "unchanged": stats["unchanged"],
+        "invalid": stats["invalid"],
+        "resumed": resumed,
+        "seconds": seconds,
+        "entries_per_second": written / seconds if seconds else 0.0,
+    }
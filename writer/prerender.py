@@ -0,0 +1,74 @@
+"""Storage for morning content pre-rendered ahead of time"""
+
+import os
+import json
+from typing import Optional, Tuple
+from config.settings import PRERENDER_FILE
+from config.state import get_state
+from content.stoic import stoic_json_get_progress, progress_to_json, progress_from_json
+from utils.locking import atomic_write
+
+# Arguments that change what goes into the morning content
+PRERENDER_ARGS = ("tarot", "zodiac", "questions", "stoic_prompt")
+
+# Stands in for the start time, which is only known when the entry is created
+PRERENDER_TIMESTAMP = "MORNINGSTARTTIME"
+
+
+def save_prerendered_content(
+    title: str, content: str, progress: Optional[dict]
+) -> None:
+    """Store pre-rendered content along with what it was rendered from"""
+    state = get_state()
+    prerendered = {
+        "title": title,
+        "args": {arg: bool(state.args[arg]) for arg in PRERENDER_ARGS},
+        "stoic_base_day": stoic_json_get_progress()["day"] if progress else None,
+        "stoic_progress": progress_to_json(progress) if progress else None,
+        "content": content,
+    }
+    if state.args["test"]:
+        print("prerender:", prerendered)
+        return
+    atomic_write(state.reference_file(PRERENDER_FILE), json.dumps(prerendered))
+
+
+def discard_prerendered_content() -> None:
+    """Remove stored pre-rendered content"""
+    state = get_state()
+    if state.args["test"]:
+        return
+    try:
+        os.remove(state.reference_file(PRERENDER_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def take_prerendered_content(title: str) -> Optional[Tuple[str, Optional[dict]]]:
+    """Return pre-rendered content and its pending stoic progress if still valid for title"""
+    state = get_state()
+    try:
+        with open(state.reference_file(PRERENDER_FILE), "r", encoding="utf-8") as file:
+            prerendered = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if prerendered.get("title") != title:
+        # Keep content rendered for a later day, drop anything older
+        if prerendered.get("title", "") < title:
+            discard_prerendered_content()
+        return None
+
+    args = {arg: bool(state.args[arg]) for arg in PRERENDER_ARGS}
+    progress = prerendered.get("stoic_progress")
+    if prerendered.get("args") != args or (
+        progress
+        and stoic_json_get_progress()["day"] != prerendered.get("stoic_base_day")
+    ):
+        discard_prerendered_content()
+        return None
+
+    discard_prerendered_content()
+    if progress:
+        progress = progress_from_json(progress)
+    return prerendered["content"], progress
@@ -0,0 +1,134 @@
+"""User-editable entry templates
+
+A template file has named sections, each starting with a [name] line, whose
+text may contain placeholders in braces (use {{ and }} for literal braces):
+
+    {title}      entry title
+    {timestamp}  time the section was started (HHMM)
+    {goal}       word count goal
+    {tarot}, {zodiac}, {questions}, {stoic}
+                 content blocks (content/providers.py), each ending in its
+                 own newline, or nothing when not requested
+
+Templates are compiled once into a render plan of literal text and placeholder
+slots and cached by file mtime. Text before the first section is ignored. The
+words in the literal text are counted at compile time, so computing the goal
+only counts the placeholder values.
+"""
+
+import re
+from os import path
+from dataclasses import dataclass
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+from config.settings import TEMPLATE_FILE
+from config.state import get_state
+from utils.cache import LRUCache
+from utils.file_ops import read_cached
+from utils.metrics import register_cache
+from writer.wordcount import get_ia_writer_style_wordcount_from_string
+
+SECTION_RE = re.compile(r"^\[(\w+)\]$", flags=re.MULTILINE)
+
+# Placeholders whose values are always a single word
+SINGLE_WORD_PLACEHOLDERS = {"timestamp", "goal"}
+PLACEHOLDERS = {"title", "tarot", "zodiac", "questions", "stoic"}
+PLACEHOLDERS |= SINGLE_WORD_PLACEHOLDERS
+
+DEFAULT_TEMPLATE = """[morning]
+{title}
+#MorningPages, started at {timestamp}
+
+
+
+Goal WC: {goal}
+{tarot}{zodiac}{questions}{stoic}
+[evening]
+
+#EveningPages, started at {timestamp}
+
+
+
+Goal WC: {goal}
+"""
+
+_compiled_templates = LRUCache(8)
+register_cache("templates", _compiled_templates)
+
+
+@dataclass
+class CompiledTemplate:
+    """Render plan for one template section"""
+
+    segments: List[Tuple[str, Optional[str]]]
+    fixed_words: int
+
+    @classmethod
+    def compile(cls, text: str) -> "CompiledTemplate":
+        """Compile template text into literal segments and placeholder slots"""
+        segments = []
+        fixed_words = 0
+        pending = ""
+        for literal, name, spec, conversion in Formatter().parse(text):
+            # Escaped braces split the literal text, join it back up to count it
+            pending += literal
+            if name is None:
+                continue
+            if name not in PLACEHOLDERS or spec or conversion:
+                raise ValueError(f"Unknown template placeholder: {{{name}}}")
+            segments.append((pending, name))
+            fixed_words += get_ia_writer_style_wordcount_from_string(pending)
+            if name in SINGLE_WORD_PLACEHOLDERS:
+                fixed_words += 1
+            pending = ""
+        if pending:
+            segments.append((pending, None))
+            fixed_words += get_ia_writer_style_wordcount_from_string(pending)
+        return cls(segments=segments, fixed_words=fixed_words)
+
+    def render(self, values: Dict[str, str], goal_offset: int) -> str:
+        """Fill in the placeholders, with the goal goal_offset words past the section"""
+        dynamic_words = sum(
+            get_ia_writer_style_wordcount_from_string(values.get(name, ""))
+            for _, name in self.segments
+            if name and name not in SINGLE_WORD_PLACEHOLDERS
+        )
+        values = dict(values, goal=str(self.fixed_words + dynamic_words + goal_offset))
+        return "".join(
+            literal + (values.get(name, "") if name else "")
+            for literal, name in self.segments
+        )
+
+
+def compile_templates(text: str) -> Dict[str, CompiledTemplate]:
+    """Compile each named section of a template file"""
+    parts = SECTION_RE.split(text)
+    templates = {}
+    for name, body in zip(parts[1::2], parts[2::2]):
+        # The newline ending the header line and the one before the next header
+        # belong to the section markers
+        body = body[1:] if body.startswith("\n") else body
+        body = body[:-1] if body.endswith("\n") else body
+        templates[name] = CompiledTemplate.compile(body)
+    return templates
+
+
+def compile_template_file(file_path: str) -> Dict[str, CompiledTemplate]:
+    """Compile a template file, using the default for any section it leaves out"""
+    with open(file_path, "r", encoding="utf-8") as file:
+        text = file.read()
+    templates = compile_templates(DEFAULT_TEMPLATE)
+    templates.update(compile_templates(text))
+    return templates
+
+
+def get_template(section: str) -> CompiledTemplate:
+    """Compiled template section from the user's template file (or the default)"""
+    file_path = get_state().reference_file(TEMPLATE_FILE)
+    if not path.exists(file_path):
+        templates = _compiled_templates.get_or_create(
+            DEFAULT_TEMPLATE, lambda: compile_templates(DEFAULT_TEMPLATE)
+        )
+    else:
+        templates = read_cached(file_path, compile_template_file, _compiled_templates)
+    return templates[section]